@@ -11,10 +11,100 @@ class Settings(BaseSettings):
     db_host: str
     db_port: int
     db_schema: str = "public"
+    # threads for the blocking DB work left on the sync engine (startup checks, LISTEN)
+    db_worker_threads: int = 4
+    # async engine connection pool; sized for concurrent webhooks plus the worker
+    db_pool_size: int = 10
+    db_max_overflow: int = 20
 
     bot_token: str
     chat_id: str
 
+    # Reminder scheduler: how far ahead to load upcoming reminders into memory,
+    # and the longest the worker sleeps before re-reading that window
+    scheduler_lookahead_seconds: int = 3600
+    scheduler_max_sleep_seconds: int = 300
+    # Due reminders enqueued per chunk; each chunk is its own transaction,
+    # so worker memory stays bounded however large the backlog is
+    scheduler_batch_size: int = 500
+    # Pre-dispatch window: due reminders are enqueued this many seconds early
+    # so a spike at a round time is already in the outbox when it is due.
+    # It also caps how early a jittered reminder may be sent.
+    scheduler_lead_seconds: int = 10
+    # Early-delivery jitter for reminders without their own jitter_seconds
+    reminder_default_jitter_seconds: int = 0
+
+    # LISTEN/NOTIFY channel used to wake schedulers when reminders are created
+    reminder_notify_channel: str = "remindarr_reminders"
+    reminder_listen_retry_seconds: int = 5
+
+    # Telegram HTTP client
+    telegram_timeout_seconds: float = 10.0
+    telegram_max_connections: int = 20
+
+    # Telegram rate limits: messages/second for the whole bot and per chat,
+    # and how often a 429 is retried after waiting out its retry_after
+    telegram_global_rate: float = 30.0
+    telegram_chat_rate: float = 1.0
+    telegram_chat_burst: float = 1.0
+    telegram_max_retries: int = 3
+
+    # Reminder worker: how many sends may be in flight at once (across chats)
+    worker_send_concurrency: int = 16
+
+    # Deliveries taken per sender transaction, and how long a sender's
+    # claim on a delivery lasts before another worker may take over
+    worker_claim_batch_size: int = 500
+    worker_claim_lease_seconds: int = 120
+
+    # Outbox sender: attempts before a delivery is dead-lettered, the
+    # exponential backoff between them, and how often the outbox is polled
+    # for retries and other processes' deliveries
+    outbox_max_attempts: int = 5
+    outbox_retry_base_seconds: float = 30.0
+    outbox_retry_max_seconds: float = 3600.0
+    outbox_poll_seconds: int = 30
+
+    # Most missed occurrences a 'fire_all' reminder sends after downtime
+    catch_up_max_occurrences: int = 10
+
+    # Leader election: one instance holds this advisory lock and runs the
+    # scheduler stage; every instance heartbeats and runs a sender. Followers
+    # retry the lock every heartbeat, so failover takes about one interval.
+    leader_lock_name: str = "remindarr-scheduler"
+    heartbeat_interval_seconds: int = 5
+    heartbeat_retention_seconds: int = 86400
+
+    # Shutdown: how long sends in flight may take to finish once the worker
+    # stops claiming new work; they are cancelled and released after that
+    shutdown_grace_seconds: float = 10.0
+
+    # Webhook updates are acknowledged at once and processed from a bounded
+    # queue (a full queue answers 503). Each chat gets its own in-order
+    # actor, dropped after the idle timeout; at most webhook_consumers
+    # updates are handled at once across chats
+    webhook_queue_size: int = 1000
+    webhook_consumers: int = 8
+    webhook_actor_idle_seconds: float = 60.0
+    # Recently seen update_ids kept for dropping Telegram redeliveries
+    update_dedupe_size: int = 10000
+    update_dedupe_ttl_seconds: int = 3600
+
+    # Where in-progress conversations (/add, /notion, /settings) live:
+    # "postgres" survives restarts and is shared by all workers, "memory"
+    # is per process. Conversations untouched for the TTL are dropped
+    conversation_state_backend: str = "postgres"
+    conversation_state_ttl_seconds: int = 86400
+    # Size of the memory store, and of the per-process read cache in front
+    # of postgres. The cache is off by default; only enable it when one
+    # process receives all of a chat's updates (a single worker, or sticky
+    # routing), or other workers may read a stale state
+    conversation_state_cache_size: int = 10000
+    conversation_state_cache_seconds: float = 0.0
+
+    # Longest digest window a user may choose, in minutes
+    digest_max_window_minutes: int = 60
+
     model_config = SettingsConfigDict()
     
 settings = Settings()
\ No newline at end of file
@@ -1,6 +1,12 @@
 # app/db/config_db.py
-from sqlalchemy import text
-from sqlmodel import SQLModel, create_engine, Session
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import inspect, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import SQLModel, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
 from app.constants.constants import Settings
 
 # Build the database URL
@@ -10,9 +16,35 @@ db_url = (
     f"{Settings().db_host}:{Settings().db_port}/{Settings().db_name}"
 )
 
-# Create SQLModel engine (sync)
+async_db_url = db_url.replace("postgresql+psycopg2://", "postgresql+asyncpg://", 1)
+
+# Create SQLModel engine (sync); used for schema setup and the LISTEN connection
 engine = create_engine(db_url, echo=True, future=True)
 
+# Async engine (asyncpg) for everything on the request and worker paths
+async_engine = create_async_engine(
+    async_db_url,
+    echo=True,
+    pool_size=Settings().db_pool_size,
+    max_overflow=Settings().db_max_overflow,
+    pool_pre_ping=True,
+)
+
+# Dedicated threads for the blocking DB work still started from async code,
+# so it never runs on the event loop or queues behind other executor jobs
+db_executor = ThreadPoolExecutor(
+    max_workers=Settings().db_worker_threads, thread_name_prefix="remindarr-db"
+)
+
+
+async def run_db(fn, *args, **kwargs):
+    """
+    Run a blocking DB function in the dedicated DB thread pool.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(db_executor, functools.partial(fn, *args, **kwargs))
+
+
 def init_db() -> None:
     """
     Initialize database schema and all SQLModel tables.
@@ -40,9 +72,53 @@ def init_db() -> None:
     # Now create all tables in the schema
     SQLModel.metadata.create_all(engine)
 
-def get_session():
+    # create_all skips columns and indexes on tables that already exist, so add any missing ones
+    with engine.begin() as conn:
+        _add_missing_columns(conn)
+        for table in SQLModel.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+
+def _add_missing_columns(conn) -> None:
+    """
+    Add model columns that don't exist yet on already-created tables.
+    New columns must be nullable or have a server default.
+    """
+    inspector = inspect(conn)
+    ddl_compiler = conn.dialect.ddl_compiler(conn.dialect, None)
+
+    for table in SQLModel.metadata.sorted_tables:
+        if not inspector.has_table(table.name, schema=table.schema):
+            continue
+
+        existing = {c["name"] for c in inspector.get_columns(table.name, schema=table.schema)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+
+            ddl = (
+                f'ALTER TABLE "{table.schema}"."{table.name}" '
+                f'ADD COLUMN IF NOT EXISTS "{column.name}" '
+                f"{column.type.compile(dialect=conn.dialect)}"
+            )
+            default = ddl_compiler.get_column_default_string(column)
+            if default is not None:
+                ddl += f" DEFAULT {default}"
+                if not column.nullable:
+                    ddl += " NOT NULL"
+            conn.execute(text(ddl))
+
+def async_session() -> AsyncSession:
+    """
+    New AsyncSession on the async engine. Objects stay loaded after commit,
+    since lazy refreshes are not possible outside an await.
+    """
+    return AsyncSession(async_engine, expire_on_commit=False)
+
+
+async def get_session():
     """
-    FastAPI dependency for a per-request session.
+    FastAPI dependency for a per-request async session.
     """
-    with Session(engine) as session:
+    async with async_session() as session:
         yield session
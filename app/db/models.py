@@ -1,13 +1,38 @@
 import uuid
-from datetime import datetime
+from datetime import datetime, timezone
 from typing import Optional, List, Dict, Any
 
-from sqlalchemy import Column, DateTime, func, JSON, String
+from sqlalchemy import BigInteger, Column, DateTime, func, JSON, String, Index, text
+from sqlalchemy.types import TypeDecorator
 from sqlmodel import SQLModel, Field
 from sqlalchemy import Text
 from app.constants.constants import Settings
 
 
+class UTCDateTime(TypeDecorator):
+    """A timezone-naive TIMESTAMP column that always holds UTC.
+
+    Aware datetimes are converted to UTC before storing and values come back
+    as aware UTC datetimes. asyncpg refuses aware datetimes for naive
+    columns, and comparing them through psycopg2 depends on the server's
+    TimeZone setting, so this keeps both drivers consistent without changing
+    the column type.
+    """
+
+    impl = DateTime
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is not None and value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value
+
+    def process_result_value(self, value, dialect):
+        if value is not None and value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value
+
+
 class Base(SQLModel):
     __table_args__ = {"schema": Settings().db_schema}
 
@@ -66,6 +91,13 @@ class Users(Base, table=True):
     notifications_enabled: bool = Field(
         default=True, description="Whether notifications are enabled"
     )
+    # Reminders due within this many minutes of one that is due now are sent
+    # with it, merged into one message; 0 sends each on its own
+    digest_window_minutes: int = Field(
+        default=0,
+        sa_column_kwargs={"server_default": "0"},
+        description="Digest window in minutes (0 = off)",
+    )
 
     # Timestamps
     created_at: datetime = Field(
@@ -90,9 +122,18 @@ class Users(Base, table=True):
 
 class Reminders(Base, table=True):
     __tablename__ = "reminders"
+    __table_args__ = (
+        # Partial index backing the worker's due-reminder query
+        Index(
+            "ix_reminders_due",
+            "next_trigger_at",
+            postgresql_where=text("active AND next_trigger_at IS NOT NULL"),
+        ),
+        {"schema": Settings().db_schema},
+    )
 
     id: str = Field(
-        default_factory=lambda: str(uuid.uuid4()), primary_key=True, index=True
+        default_factory=lambda: str(uuid.uuid4()), primary_key=True
     )
 
     created_at: Optional[datetime] = Field(
@@ -112,6 +153,13 @@ class Reminders(Base, table=True):
 
     active: bool = Field(default=True, nullable=False)
 
+    # Set while the chat is unreachable (bot blocked, chat deleted); cleared on /start
+    suspended: bool = Field(
+        default=False,
+        sa_column_kwargs={"server_default": "false"},
+        description="Whether delivery is paused because the chat is unreachable",
+    )
+
     reminder_name: str = Field(sa_column=Column(Text))
     reminder_content: str = Field(nullable=False)
 
@@ -132,17 +180,180 @@ class Reminders(Base, table=True):
         default=None, nullable=True, description="Repeat interval in minutes"
     )
 
+    # What to do with occurrences of a recurring reminder missed during
+    # downtime: 'fire_once', 'fire_all' (capped) or 'skip'
+    catch_up_policy: str = Field(
+        default="fire_once",
+        sa_column_kwargs={"server_default": "fire_once"},
+        description="Catch-up policy for missed recurring occurrences",
+    )
+
+    # How many seconds early this reminder may go out, so a burst of reminders
+    # due at the same instant can be spread out; None uses the app default
+    jitter_seconds: Optional[int] = Field(
+        default=None,
+        nullable=True,
+        description="Accepted early-delivery tolerance in seconds",
+    )
+
     # Next time this reminder should trigger
     next_trigger_at: Optional[datetime] = Field(
-        default=None, description="Next reminder trigger time"
+        default=None,
+        sa_column=Column(UTCDateTime, nullable=True),
+        description="Next reminder trigger time",
     )
 
     # Last time this reminder was triggered
     last_triggered_at: Optional[datetime] = Field(
-        default=None, description="Last reminder trigger time"
+        default=None,
+        sa_column=Column(UTCDateTime, nullable=True),
+        description="Last reminder trigger time",
     )
 
     # Chat id where the reminder should be sent. Optional to preserve existing rows.
     chat_id: Optional[str] = Field(
-        default=None, description="Telegram chat id to send the reminder to"
+        default=None,
+        index=True,
+        description="Telegram chat id to send the reminder to",
+    )
+
+
+class ReminderDeliveries(Base, table=True):
+    """Outbox of reminder messages: written by the scheduler, drained by the sender."""
+
+    __tablename__ = "reminder_deliveries"
+    __table_args__ = (
+        # Partial index backing the sender's pending-delivery query
+        Index(
+            "ix_reminder_deliveries_pending",
+            "scheduled_for",
+            postgresql_where=text("status = 'pending'"),
+        ),
+        # Chats a sender is working on, so no other sender claims them
+        Index(
+            "ix_reminder_deliveries_claimed",
+            "chat_id",
+            postgresql_where=text("status = 'pending' AND claimed_until IS NOT NULL"),
+        ),
+        {"schema": Settings().db_schema},
+    )
+
+    id: str = Field(
+        default_factory=lambda: str(uuid.uuid4()), primary_key=True
+    )
+
+    created_at: Optional[datetime] = Field(
+        sa_column=Column(
+            DateTime(timezone=True), server_default=func.now(), nullable=False
+        )
+    )
+
+    reminder_id: str = Field(
+        index=True, description="Reminder this delivery was created from"
+    )
+    chat_id: str = Field(description="Telegram chat id to send the message to")
+    message: str = Field(sa_column=Column(Text, nullable=False))
+
+    # When the reminder was due; the message may go out later if sends are backed up
+    scheduled_for: datetime = Field(
+        sa_column=Column(UTCDateTime, nullable=False),
+        description="Trigger time this delivery is for",
+    )
+
+    # Earliest send time: scheduled_for minus the reminder's jitter. NULL on
+    # rows written before jitter existed, which means scheduled_for
+    not_before: Optional[datetime] = Field(
+        default=None,
+        sa_column=Column(UTCDateTime, nullable=True),
+        description="Earliest time the message may be sent",
+    )
+
+    # 'pending' until sent, then 'sent'; 'dead' after a permanent error or
+    # once attempts are exhausted (the dead-letter state)
+    status: str = Field(default="pending", description="pending, sent or dead")
+    attempt_count: int = Field(default=0, description="Send attempts made so far")
+    next_retry_at: Optional[datetime] = Field(
+        default=None,
+        sa_column=Column(UTCDateTime, nullable=True),
+        description="Earliest time a failed delivery is retried",
+    )
+    last_error: Optional[str] = Field(
+        default=None, sa_column=Column(Text, nullable=True)
+    )
+    sent_at: Optional[datetime] = Field(
+        default=None,
+        sa_column=Column(UTCDateTime, nullable=True),
+        description="When Telegram accepted the message",
+    )
+
+    # Lease taken by a sender while it sends this delivery; once claimed_until
+    # passes (e.g. the sender crashed) another sender may claim it again
+    claimed_by: Optional[str] = Field(
+        default=None, description="Worker instance currently sending this delivery"
+    )
+    claimed_until: Optional[datetime] = Field(
+        default=None,
+        sa_column=Column(UTCDateTime, nullable=True),
+        description="When the sender's claim expires",
+    )
+
+
+class WorkerHeartbeats(Base, table=True):
+    """One row per running app instance, refreshed while it is alive."""
+
+    __tablename__ = "worker_heartbeats"
+
+    instance_id: str = Field(primary_key=True, description="hostname:pid of the instance")
+    started_at: datetime = Field(
+        sa_column=Column(DateTime(timezone=True), nullable=False)
+    )
+    last_seen_at: datetime = Field(
+        sa_column=Column(DateTime(timezone=True), nullable=False)
+    )
+
+    # Whether the instance holds the scheduler advisory lock
+    is_leader: bool = Field(default=False, description="Whether this instance runs the scheduler")
+
+
+class TelegramUpdateOffsets(Base, table=True):
+    """Highest Telegram update_id processed, per bot."""
+
+    __tablename__ = "telegram_update_offsets"
+
+    bot_id: str = Field(primary_key=True, description="Numeric bot id (the bot token prefix)")
+    last_update_id: int = Field(
+        sa_column=Column(BigInteger, nullable=False),
+        description="Highest update_id processed so far",
+    )
+    updated_at: Optional[datetime] = Field(
+        sa_column=Column(
+            DateTime(timezone=True),
+            server_default=func.now(),
+            onupdate=func.now(),
+            nullable=False,
+        )
+    )
+
+
+class ConversationStates(Base, table=True):
+    """In-progress bot conversation (/add, /notion, /settings) per chat."""
+
+    __tablename__ = "conversation_states"
+    __table_args__ = (
+        Index("ix_conversation_states_updated_at", "updated_at"),
+        {"schema": Settings().db_schema},
+    )
+
+    chat_id: str = Field(primary_key=True, description="Telegram chat ID")
+    state: Dict[str, Any] = Field(
+        sa_column=Column(JSON, nullable=False),
+        description="Serialized flow type, step and collected answers",
+    )
+    updated_at: Optional[datetime] = Field(
+        sa_column=Column(
+            DateTime(timezone=True),
+            server_default=func.now(),
+            onupdate=func.now(),
+            nullable=False,
+        )
     )
@@ -1,19 +1,26 @@
 from fastapi import APIRouter, Request, Depends, HTTPException
 from pydantic import BaseModel
 from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import update
 from sqlmodel import select
 from datetime import datetime, timedelta
 from typing import List, Dict, Any, Optional
 from enum import Enum
+import asyncio
 import re
+import copy
 import json
 import requests
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 
-from app.db.config_db import get_session
+from app.db.config_db import async_session, get_session
 from app.db.models import Reminders, Users
+from app.services.reminder_notify import notify_reminders_scheduled
+from app.services.state_store import state_store
 from app.services.telegram import send_message
+from app.services.update_dedupe import is_duplicate, mark_received, mark_refused, record_processed
+from app.services.update_queue import chat_is_idle, enqueue_update
 from app.constants.constants import settings
 from app.utils.logging_utils import logger
 from app.utils.time_utils import parse_time_unit, calculate_next_trigger
@@ -76,8 +83,20 @@ class UserState:
         self.step = step
         self.data = {}
 
+    def to_dict(self) -> dict:
+        return {"flow_type": self.flow_type.value, "step": self.step, "data": self.data}
+
+    @classmethod
+    def from_dict(cls, stored: dict) -> "UserState":
+        state = cls()
+        state.flow_type = FlowType(stored.get("flow_type", FlowType.NONE.value))
+        state.step = stored.get("step", 0)
+        state.data = copy.deepcopy(stored.get("data", {}))
+        return state
+
 
-# In-memory state stores
+# States of the updates being handled, loaded from and saved back to
+# state_store by process_update; a chat has at most one update in flight
 user_states: Dict[int, UserState] = {}
 
 
@@ -94,18 +113,38 @@ def clear_user_state(chat_id: int):
         del user_states[chat_id]
 
 
+async def load_user_state(chat_id: int) -> dict:
+    """Load the stored state into ``user_states``; returns it as stored."""
+    stored = await state_store.load(chat_id) or {}
+    if stored:
+        user_states[chat_id] = UserState.from_dict(stored)
+    return stored
+
+
+async def save_user_state(chat_id: int, stored: dict) -> None:
+    """Write the state back to ``state_store`` if the update changed it."""
+    state = user_states.pop(chat_id, None)
+    current = state.to_dict() if state and state.flow_type != FlowType.NONE else {}
+    if current == stored:
+        return
+    if current:
+        await state_store.save(chat_id, current)
+    else:
+        await state_store.delete(chat_id)
+
+
 # ============================================
 # USER MANAGEMENT
 # ============================================
 
 
-async def get_or_create_user(db: Session, telegram_data: dict) -> Users:
+async def get_or_create_user(db: AsyncSession, telegram_data: dict) -> Users:
     """Get existing user or create new one from Telegram data."""
     message = telegram_data["message"]
     from_user = message["from"]
     chat = message["chat"]
 
-    user = db.get(Users, str(chat["id"]))
+    user = await db.get(Users, str(chat["id"]))
     if not user:
         user = Users(
             chat_id=str(chat["id"]),
@@ -121,18 +160,41 @@ async def get_or_create_user(db: Session, telegram_data: dict) -> Users:
         user.username = from_user.get("username", user.username)
         user.first_name = from_user.get("first_name", user.first_name)
         user.language_code = from_user.get("language_code", user.language_code)
-        user.last_active_at = datetime.utcnow()
+        user.last_active_at = datetime.now(timezone.utc)
         db.add(user)
 
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     return user
 
 
+async def reactivate_user(db: AsyncSession, user: Users) -> None:
+    """Re-enable notifications for a user the worker suspended (bot was blocked, etc.)."""
+    if user.notifications_enabled:
+        return
+
+    user.notifications_enabled = True
+    db.add(user)
+    resumed = (await db.exec(
+        update(Reminders)
+        .where(Reminders.chat_id == user.chat_id)
+        .where(Reminders.suspended == True)
+        .values(suspended=False)
+        .returning(Reminders.next_trigger_at)
+    )).scalars().all()
+    await notify_reminders_scheduled(db, resumed)
+    await db.commit()
+    await db.refresh(user)
+    logger.info(f"Reactivated notifications for user: {user.chat_id}")
+
+
 # ============================================
 # NOTION API HELPERS
 # ============================================
 
+# These block on HTTP calls to Notion; handlers run them with
+# asyncio.to_thread so the event loop (and the webhook) keeps running.
+
 
 def validate_notion_token(token: str) -> tuple[bool, Optional[dict]]:
     """Validate Notion API token."""
@@ -328,10 +390,9 @@ def escape_markdown(text: str) -> str:
     return text
 
 
-def send_start_message(chat_id: int, user: Users):
-    """Send welcome message with user's name."""
-    name = user.first_name or user.username or "there"
-    message = f"""👋 Hello {name}! Welcome to Reminder Bot!
+def start_message(name: str) -> str:
+    """Welcome message with the user's name."""
+    return f"""👋 Hello {name}! Welcome to Reminder Bot!
 
 I can help you manage reminders and sync with Notion databases.
 
@@ -346,12 +407,8 @@ I can help you manage reminders and sync with Notion databases.
 
 Let me know how I can assist you today!"""
 
-    send_message(settings.bot_token, chat_id, message)
-
 
-def send_help_message(chat_id: int):
-    """Send detailed help message."""
-    message = """📚 Reminder Bot Help
+HELP_MESSAGE = """📚 Reminder Bot Help
 
 Creating Reminders:
 Use /add to create a new reminder. I'll guide you through:
@@ -380,33 +437,76 @@ Tips:
 • Recurring reminders repeat automatically
 • Use clear, descriptive reminder names"""
 
-    send_message(settings.bot_token, chat_id, message)
+CANCEL_MESSAGE = "❌ Cancelled. All progress cleared."
 
+# set on an update whose reply went back in the webhook response
+ANSWERED_INLINE = "_answered_inline"
 
-def send_settings_menu(chat_id: int, user: Users):
+
+def command_reply(data: dict) -> Optional[str]:
+    """The reply to /start, /help or /cancel, which depends on the update alone."""
+    message = data["message"]
+    text = message.get("text", "").strip()
+
+    if text == "/start":
+        from_user = message.get("from", {})
+        return start_message(from_user.get("first_name") or from_user.get("username") or "there")
+    if text == "/help":
+        return HELP_MESSAGE
+    if text in ("/cancel", "cancel"):
+        return CANCEL_MESSAGE
+    return None
+
+
+def inline_reply(data: dict) -> Optional[dict]:
+    """The reply to an update as a Bot API method call, if it can be given
+    without the database.
+
+    Telegram runs a method returned as the webhook response, which saves a
+    sendMessage round trip. Only replies that depend on the update alone
+    qualify, since the update itself is processed after the response.
+    """
+    reply = command_reply(data)
+    if reply is None:
+        return None
+    return {"method": "sendMessage", "chat_id": data["message"]["chat"]["id"], "text": reply}
+
+
+async def send_command_reply(data: dict) -> None:
+    """Send the /start, /help or /cancel reply unless it went back inline."""
+    if data.get(ANSWERED_INLINE):
+        return
+    await send_message(settings.bot_token, data["message"]["chat"]["id"], command_reply(data))
+
+
+async def send_settings_menu(chat_id: int, user: Users):
     """Send interactive settings menu."""
     notion_status = "✅ Enabled" if user.notion_enabled else "❌ Disabled"
     freq = getattr(user, "notion_check_frequence", 12)
     db_count = len(user.notion_db_pages or [])
+    digest = user.digest_window_minutes or 0
+    digest_status = f"{digest} minutes" if digest else "❌ Disabled"
 
     message = f"""⚙️ Settings Menu
 
 Notion Integration: {notion_status}
 Refresh Frequency: {freq} hours
 Connected Databases: {db_count}
+Reminder Digest: {digest_status}
 
 Available Commands:
 • toggle - Enable/disable Notion sync
 • freq 12 or freq 24 - Change refresh frequency
+• digest <minutes> or digest off - Send reminders due within that many minutes together, when the first is due (later ones arrive early)
 • databases - View connected databases
 • done - Exit settings
 
 Reply with a command to configure your settings."""
 
-    send_message(settings.bot_token, chat_id, message)
+    await send_message(settings.bot_token, chat_id, message)
 
 
-def send_notion_menu(chat_id: int, user: Users):
+async def send_notion_menu(chat_id: int, user: Users):
     """Send Notion integration menu."""
     has_token = bool(user.notion_api_key)
 
@@ -441,7 +541,7 @@ Available Commands:
 
 Reply with a command to manage your integration."""
 
-    send_message(settings.bot_token, chat_id, message)
+    await send_message(settings.bot_token, chat_id, message)
 
 
 # ============================================
@@ -450,7 +550,7 @@ Reply with a command to manage your integration."""
 
 
 async def handle_notion_flow(
-    chat_id: int, text: str, user: Users, state: UserState, db: Session
+    chat_id: int, text: str, user: Users, state: UserState, db: AsyncSession
 ):
     """Handle Notion integration flow."""
     step = state.step
@@ -462,7 +562,7 @@ async def handle_notion_flow(
 
         if cmd in ("add", "add db", "add database"):
             state.step = NotionStep.DB_ID.value
-            send_message(
+            await send_message(
                 settings.bot_token,
                 chat_id,
                 "📎 Send the Notion database ID or URL you want to monitor.\n\n"
@@ -474,7 +574,7 @@ async def handle_notion_flow(
         elif cmd in ("remove", "remove db", "remove database"):
             pages = user.notion_db_pages or []
             if not pages:
-                send_message(
+                await send_message(
                     settings.bot_token,
                     chat_id,
                     "You don't have any databases connected.",
@@ -485,7 +585,7 @@ async def handle_notion_flow(
             listing = "\n".join(
                 [f"{i+1}. `{p[:8]}...{p[-8:]}`" for i, p in enumerate(pages)]
             )
-            send_message(
+            await send_message(
                 settings.bot_token,
                 chat_id,
                 f"*Connected Databases:*\n{listing}\n\nReply with the number to remove:",
@@ -496,18 +596,18 @@ async def handle_notion_flow(
         elif cmd in ("list", "databases", "show"):
             pages = user.notion_db_pages or []
             if not pages:
-                send_message(settings.bot_token, chat_id, "No databases connected.")
+                await send_message(settings.bot_token, chat_id, "No databases connected.")
                 return
 
             listing = "\n".join([f"{i+1}. `{p}`" for i, p in enumerate(pages)])
-            send_message(
+            await send_message(
                 settings.bot_token, chat_id, f"*Connected Databases:*\n{listing}"
             )
             return
 
         elif cmd in ("change token", "change api", "update token"):
             state.step = NotionStep.TOKEN.value
-            send_message(
+            await send_message(
                 settings.bot_token,
                 chat_id,
                 "🔑 Send your new Notion integration token (starts with 'secret_' or 'ntn_'):",
@@ -516,26 +616,26 @@ async def handle_notion_flow(
 
         elif cmd == "done":
             clear_user_state(chat_id)
-            send_message(settings.bot_token, chat_id, "✅ Notion setup complete!")
+            await send_message(settings.bot_token, chat_id, "✅ Notion setup complete!")
             return
 
         else:
-            send_notion_menu(chat_id, user)
+            await send_notion_menu(chat_id, user)
             return
 
     # STEP 1: Token submission
     elif step == NotionStep.TOKEN.value:
         if not text.startswith(("secret_", "ntn_")):
-            send_message(
+            await send_message(
                 settings.bot_token,
                 chat_id,
                 "❌ Invalid token format. It should start with 'secret_' or 'ntn_'.\n\nPlease try again:",
             )
             return
 
-        valid, user_info = validate_notion_token(text)
+        valid, user_info = await asyncio.to_thread(validate_notion_token, text)
         if not valid:
-            send_message(
+            await send_message(
                 settings.bot_token,
                 chat_id,
                 "❌ Token validation failed. Please check and try again:",
@@ -546,11 +646,11 @@ async def handle_notion_flow(
             user.notion_api_key = text
             user.notion_enabled = True
             db.add(user)
-            db.commit()
-            db.refresh(user)  # Refresh to get updated data
+            await db.commit()
+            await db.refresh(user)  # Refresh to get updated data
 
             notion_name = user_info.get("name") or "your Notion account"
-            send_message(
+            await send_message(
                 settings.bot_token,
                 chat_id,
                 f"✅ Successfully connected to Notion as: *{notion_name}*\n\n"
@@ -560,7 +660,7 @@ async def handle_notion_flow(
 
         except Exception as e:
             logger.error(f"Failed to save Notion token for user {chat_id}: {e}")
-            send_message(
+            await send_message(
                 settings.bot_token,
                 chat_id,
                 "❌ Failed to save settings. Please try again later.",
@@ -571,7 +671,7 @@ async def handle_notion_flow(
     # STEP 2: Database ID
     elif step == NotionStep.DB_ID.value:
         if text.strip().lower() == "done":
-            send_message(settings.bot_token, chat_id, "✅ Database setup complete!")
+            await send_message(settings.bot_token, chat_id, "✅ Database setup complete!")
             clear_user_state(chat_id)
             return
 
@@ -581,9 +681,9 @@ async def handle_notion_flow(
             match.group(0).replace("-", "") if match else text.strip().replace("-", "")
         )
 
-        success, db_info = get_notion_database(user.notion_api_key, db_id)
+        success, db_info = await asyncio.to_thread(get_notion_database, user.notion_api_key, db_id)
         if not success:
-            send_message(
+            await send_message(
                 settings.bot_token,
                 chat_id,
                 "❌ Couldn't access that database.\n\n"
@@ -598,7 +698,7 @@ async def handle_notion_flow(
         prop_names = list(properties.keys())
 
         if not prop_names:
-            send_message(
+            await send_message(
                 settings.bot_token, chat_id, "❌ This database has no properties."
             )
             return
@@ -611,7 +711,7 @@ async def handle_notion_flow(
         state.step = NotionStep.NAME_PROP.value
 
         props_text = "\n".join([f"• {p}" for p in prop_names])
-        send_message(
+        await send_message(
             settings.bot_token,
             chat_id,
             f"✅ Found database with {len(prop_names)} properties:\n\n{props_text}\n\n"
@@ -625,7 +725,7 @@ async def handle_notion_flow(
         properties = state.data.get("properties", [])
 
         if prop not in properties:
-            send_message(
+            await send_message(
                 settings.bot_token,
                 chat_id,
                 "❌ That property wasn't found. Please reply with an exact property name from the list.",
@@ -635,7 +735,7 @@ async def handle_notion_flow(
         state.data["name_prop"] = prop
         state.step = NotionStep.TIME_PROP.value
 
-        send_message(
+        await send_message(
             settings.bot_token,
             chat_id,
             "⏰ Which property contains the *task due date/time*? (Must be a Date property)",
@@ -648,7 +748,7 @@ async def handle_notion_flow(
         properties = state.data.get("properties", [])
 
         if prop not in properties:
-            send_message(
+            await send_message(
                 settings.bot_token,
                 chat_id,
                 "❌ That property wasn't found. Please reply with an exact property name.",
@@ -658,7 +758,7 @@ async def handle_notion_flow(
         state.data["time_prop"] = prop
         state.step = NotionStep.STATUS_PROP.value
 
-        send_message(
+        await send_message(
             settings.bot_token,
             chat_id,
             "✅ Which property indicates if a task is *done*? (Checkbox or Status property)\n\n"
@@ -672,7 +772,7 @@ async def handle_notion_flow(
         properties = state.data.get("properties", [])
 
         if prop not in properties:
-            send_message(
+            await send_message(
                 settings.bot_token,
                 chat_id,
                 "❌ That property wasn't found. Please reply with an exact property name.",
@@ -682,7 +782,7 @@ async def handle_notion_flow(
         state.data["status_prop"] = prop
         state.step = NotionStep.IMPORT_CONFIRM.value
 
-        send_message(
+        await send_message(
             settings.bot_token,
             chat_id,
             "🎯 Mapping complete!\n\n"
@@ -696,7 +796,7 @@ async def handle_notion_flow(
         choice = text.strip().lower()
 
         if choice not in ("yes", "no"):
-            send_message(settings.bot_token, chat_id, "Please reply 'yes' or 'no'.")
+            await send_message(settings.bot_token, chat_id, "Please reply 'yes' or 'no'.")
             return
 
         db_id = state.data.get("current_db_id")
@@ -725,12 +825,12 @@ async def handle_notion_flow(
             user.notion_db_mappings = mappings
 
             db.add(user)
-            db.commit()
-            db.refresh(user)  # Refresh to get updated data
+            await db.commit()
+            await db.refresh(user)  # Refresh to get updated data
 
         except Exception as e:
             logger.error(f"Failed to save Notion mapping for user {chat_id}: {e}")
-            send_message(
+            await send_message(
                 settings.bot_token,
                 chat_id,
                 "❌ Failed to save mapping. Please try again.",
@@ -739,7 +839,7 @@ async def handle_notion_flow(
             return
 
         if choice == "no":
-            send_message(
+            await send_message(
                 settings.bot_token,
                 chat_id,
                 "✅ Mapping saved without importing.\n\nAdd more databases or send 'done'.",
@@ -748,11 +848,12 @@ async def handle_notion_flow(
             return
 
         # Perform import
-        send_message(
+        await send_message(
             settings.bot_token, chat_id, "⏳ Importing tasks due in next 24 hours..."
         )
 
-        success, pages = query_notion_database(
+        success, pages = await asyncio.to_thread(
+            query_notion_database,
             user.notion_api_key,
             db_id,
             time_prop=time_prop,  # Add this
@@ -760,7 +861,7 @@ async def handle_notion_flow(
             status_prop_type=status_prop_type,
         )
         if not success:
-            send_message(
+            await send_message(
                 settings.bot_token,
                 chat_id,
                 "❌ Failed to query database. Mapping saved but import failed.",
@@ -770,6 +871,7 @@ async def handle_notion_flow(
 
         imported = 0
         skipped = 0
+        imported_trigger_times = []
 
         for page in pages:
             try:
@@ -807,15 +909,17 @@ async def handle_notion_flow(
                         logger.warning(f"Failed to parse date {time_val}: {parse_err}")
 
                 db.add(reminder)
+                imported_trigger_times.append(reminder.next_trigger_at)
                 imported += 1
 
             except Exception as e:
                 logger.error(f"Failed to import Notion page for user {chat_id}: {e}")
                 skipped += 1
 
-        db.commit()
+        await notify_reminders_scheduled(db, imported_trigger_times)
+        await db.commit()
 
-        send_message(
+        await send_message(
             settings.bot_token,
             chat_id,
             f"✅ Import complete!\n\n"
@@ -845,10 +949,10 @@ async def handle_notion_flow(
             user.notion_db_pages = pages
             user.notion_db_mappings = mappings
             db.add(user)
-            db.commit()
-            db.refresh(user)  # Refresh to get updated data
+            await db.commit()
+            await db.refresh(user)  # Refresh to get updated data
 
-            send_message(
+            await send_message(
                 settings.bot_token,
                 chat_id,
                 f"✅ Removed database: `{removed[:8]}...{removed[-8:]}`",
@@ -856,7 +960,7 @@ async def handle_notion_flow(
 
         except Exception as e:
             logger.warning(f"Invalid database removal selection: {e}")
-            send_message(
+            await send_message(
                 settings.bot_token, chat_id, "❌ Invalid selection. Please try again."
             )
             return
@@ -871,7 +975,7 @@ async def handle_notion_flow(
 
 
 async def handle_settings_flow(
-    chat_id: int, text: str, user: Users, state: UserState, db: Session
+    chat_id: int, text: str, user: Users, state: UserState, db: AsyncSession
 ):
     """Handle settings configuration flow."""
     cmd = text.strip().lower()
@@ -879,12 +983,12 @@ async def handle_settings_flow(
     if cmd in ("toggle", "enable", "disable"):
         user.notion_enabled = not bool(user.notion_enabled)
         db.add(user)
-        db.commit()
-        db.refresh(user)  # Refresh to get updated data
+        await db.commit()
+        await db.refresh(user)  # Refresh to get updated data
 
         status = "enabled" if user.notion_enabled else "disabled"
-        send_message(settings.bot_token, chat_id, f"✅ Notion integration {status}.")
-        send_settings_menu(chat_id, user)
+        await send_message(settings.bot_token, chat_id, f"✅ Notion integration {status}.")
+        await send_settings_menu(chat_id, user)
         return
 
     elif cmd.startswith("freq"):
@@ -892,40 +996,64 @@ async def handle_settings_flow(
         if len(parts) == 2 and parts[1] in ("12", "24"):
             user.notion_check_frequence = int(parts[1])
             db.add(user)
-            db.commit()
-            db.refresh(user)  # Refresh to get updated data
-            send_message(
+            await db.commit()
+            await db.refresh(user)  # Refresh to get updated data
+            await send_message(
                 settings.bot_token,
                 chat_id,
                 f"✅ Refresh frequency set to {parts[1]} hours.",
             )
-            send_settings_menu(chat_id, user)
+            await send_settings_menu(chat_id, user)
         else:
-            send_message(
+            await send_message(
                 settings.bot_token,
                 chat_id,
                 "❌ Invalid format. Use: `freq 12` or `freq 24`",
             )
         return
 
+    elif cmd.startswith("digest"):
+        parts = cmd.split()
+        max_window = settings.digest_max_window_minutes
+        if len(parts) == 2 and parts[1] in ("off", "0"):
+            window = 0
+        elif len(parts) == 2 and parts[1].isdigit() and 1 <= int(parts[1]) <= max_window:
+            window = int(parts[1])
+        else:
+            await send_message(
+                settings.bot_token,
+                chat_id,
+                f"❌ Invalid format. Use: `digest 5` (1-{max_window} minutes) or `digest off`",
+            )
+            return
+
+        user.digest_window_minutes = window
+        db.add(user)
+        await db.commit()
+        await db.refresh(user)  # Refresh to get updated data
+        status = f"set to {window} minutes" if window else "disabled"
+        await send_message(settings.bot_token, chat_id, f"✅ Reminder digest {status}.")
+        await send_settings_menu(chat_id, user)
+        return
+
     elif cmd in ("databases", "db", "list"):
         pages = user.notion_db_pages or []
         if not pages:
-            send_message(settings.bot_token, chat_id, "No databases connected.")
+            await send_message(settings.bot_token, chat_id, "No databases connected.")
         else:
             listing = "\n".join([f"{i+1}. `{p}`" for i, p in enumerate(pages)])
-            send_message(
+            await send_message(
                 settings.bot_token, chat_id, f"*Connected Databases:*\n{listing}"
             )
         return
 
     elif cmd == "done":
         clear_user_state(chat_id)
-        send_message(settings.bot_token, chat_id, "✅ Settings saved.")
+        await send_message(settings.bot_token, chat_id, "✅ Settings saved.")
         return
 
     else:
-        send_settings_menu(chat_id, user)
+        await send_settings_menu(chat_id, user)
         return
 
 
@@ -934,7 +1062,7 @@ async def handle_settings_flow(
 # ============================================
 
 
-async def handle_reminder_flow(chat_id: int, text: str, state: UserState, db: Session):
+async def handle_reminder_flow(chat_id: int, text: str, state: UserState, db: AsyncSession):
     """Handle reminder creation flow."""
     step = state.step
     chat_id_str = str(chat_id)  # Convert for database operations
@@ -943,7 +1071,7 @@ async def handle_reminder_flow(chat_id: int, text: str, state: UserState, db: Se
     if step == ReminderStep.NAME.value:
         state.data["name"] = text
         state.step = ReminderStep.TYPE.value
-        send_message(
+        await send_message(
             settings.bot_token,
             chat_id,
             "🔄 Should this be a *one-time* reminder or *recurring*?\n\nReply: `once` or `recurring`",
@@ -959,7 +1087,7 @@ async def handle_reminder_flow(chat_id: int, text: str, state: UserState, db: Se
         elif reminder_type in ("recurring", "repeat", "repeating"):
             state.data["is_recurring"] = True
         else:
-            send_message(
+            await send_message(
                 settings.bot_token,
                 chat_id,
                 "❌ Please reply with 'once' or 'recurring'.",
@@ -967,7 +1095,7 @@ async def handle_reminder_flow(chat_id: int, text: str, state: UserState, db: Se
             return
 
         state.step = ReminderStep.UNIT.value
-        send_message(
+        await send_message(
             settings.bot_token,
             chat_id,
             "⏰ When should I remind you?\n\nReply: `minutes`, `hours`, or `days`",
@@ -979,7 +1107,7 @@ async def handle_reminder_flow(chat_id: int, text: str, state: UserState, db: Se
         multiplier, unit = parse_time_unit(text)
 
         if not multiplier or not unit:
-            send_message(
+            await send_message(
                 settings.bot_token,
                 chat_id,
                 "❌ Please reply with 'minutes', 'hours', or 'days'.",
@@ -990,7 +1118,7 @@ async def handle_reminder_flow(chat_id: int, text: str, state: UserState, db: Se
         state.data["multiplier"] = multiplier
         state.step = ReminderStep.AMOUNT.value
 
-        send_message(
+        await send_message(
             settings.bot_token, chat_id, f"🔢 How many {unit}?\n\nReply with a number:"
         )
         return
@@ -1005,14 +1133,14 @@ async def handle_reminder_flow(chat_id: int, text: str, state: UserState, db: Se
             state.data["amount"] = amount
             state.step = ReminderStep.CONTENT.value
 
-            send_message(
+            await send_message(
                 settings.bot_token,
                 chat_id,
                 "💬 What message should I send when reminding you?",
             )
 
         except ValueError:
-            send_message(
+            await send_message(
                 settings.bot_token, chat_id, "❌ Please enter a valid positive number."
             )
         return
@@ -1036,10 +1164,11 @@ async def handle_reminder_flow(chat_id: int, text: str, state: UserState, db: Se
                 chat_id=chat_id_str,  # Use string version
             )
             db.add(reminder)
-            db.commit()
+            await notify_reminders_scheduled(db, [next_trigger_at])
+            await db.commit()
 
             type_str = "recurring" if is_recurring else "one-time"
-            send_message(
+            await send_message(
                 settings.bot_token,
                 chat_id,
                 f"✅ *{type_str.title()} Reminder Created!*\n\n"
@@ -1053,7 +1182,7 @@ async def handle_reminder_flow(chat_id: int, text: str, state: UserState, db: Se
 
         except Exception as e:
             logger.error(f"Failed to create reminder for user {chat_id}: {e}")
-            send_message(
+            await send_message(
                 settings.bot_token,
                 chat_id,
                 "❌ Failed to create reminder. Please try again later.",
@@ -1068,8 +1197,12 @@ async def handle_reminder_flow(chat_id: int, text: str, state: UserState, db: Se
 
 
 @router.post("/webhook")
-async def telegram_webhook(request: Request, db: Session = Depends(get_session)):
-    """Main webhook handler for Telegram messages."""
+async def telegram_webhook(request: Request):
+    """Main webhook handler for Telegram messages.
+
+    Only validates and queues the update; ``process_update`` does the work
+    on a consumer task, so Telegram gets its answer immediately.
+    """
     try:
         body = await request.body()
         if not body:
@@ -1077,22 +1210,17 @@ async def telegram_webhook(request: Request, db: Session = Depends(get_session))
             return JSONResponse(content={"status": "ignored", "reason": "empty body"})
 
         data = await request.json()
-        logger.info(f"Incoming Telegram webhook: {json.dumps(data, indent=2)}")
+
+        # a redelivery of an update we already have; 200 so Telegram stops retrying
+        if is_duplicate(data.get("update_id")):
+            return JSONResponse(content={"status": "ignored", "reason": "duplicate"})
 
         if "message" not in data:
             return JSONResponse(
                 content={"status": "ignored", "reason": "no message field"}
             )
 
-        # Create or update user record
-        user = await get_or_create_user(db, data)
-        chat_id = data["message"]["chat"]["id"]  # This is an int from Telegram
-        text = data["message"].get("text", "").strip()
-
-        # Convert chat_id to string for consistency with database
-        chat_id_str = str(chat_id)
-
-        if not text:
+        if not data["message"].get("text", "").strip():
             return JSONResponse(content={"status": "ignored", "reason": "empty text"})
 
     except json.JSONDecodeError as e:
@@ -1100,11 +1228,57 @@ async def telegram_webhook(request: Request, db: Session = Depends(get_session))
         return JSONResponse(
             content={"status": "error", "reason": "invalid JSON"}, status_code=400
         )
-    except Exception as e:
-        logger.error(f"Webhook processing error: {e}", exc_info=True)
+
+    # Answer simple commands in the response instead of a separate
+    # sendMessage, but only when the chat has nothing in flight: an inline
+    # reply would overtake the replies to the chat's earlier updates
+    reply = inline_reply(data) if chat_is_idle(data) else None
+    if reply is not None:
+        data[ANSWERED_INLINE] = True
+
+    if not enqueue_update(data):
+        # Telegram redelivers the update later
+        mark_refused(data.get("update_id"))
+        logger.warning(f"Update queue full; refusing update {data.get('update_id')}")
         return JSONResponse(
-            content={"status": "error", "reason": str(e)}, status_code=500
+            content={"status": "error", "reason": "busy"}, status_code=503
         )
+    # only now, so a redelivery of a refused update is not dropped
+    mark_received(data.get("update_id"))
+
+    return reply or {"status": "ok"}
+
+
+async def process_update(data: dict) -> None:
+    """Handle one Telegram update; runs on an update queue consumer."""
+    chat_id = data["message"]["chat"]["id"]
+    async with async_session() as db:
+        try:
+            stored = await load_user_state(chat_id)
+            try:
+                await _handle_update(data, db)
+            finally:
+                await save_user_state(chat_id, stored)
+        finally:
+            # persist the high-water mark even if handling failed; the update
+            # was acknowledged and Telegram will not send it again
+            try:
+                await db.rollback()
+                await record_processed(db, data.get("update_id"))
+            except Exception as e:
+                logger.warning(f"Could not record Telegram update {data.get('update_id')}: {e}")
+
+
+async def _handle_update(data: dict, db: AsyncSession) -> None:
+    logger.info(f"Incoming Telegram webhook: {json.dumps(data, indent=2)}")
+
+    # Create or update user record
+    user = await get_or_create_user(db, data)
+    chat_id = data["message"]["chat"]["id"]  # This is an int from Telegram
+    text = data["message"].get("text", "").strip()
+
+    # Convert chat_id to string for consistency with database
+    chat_id_str = str(chat_id)
 
     # Get current user state
     state = get_user_state(chat_id)
@@ -1116,39 +1290,40 @@ async def telegram_webhook(request: Request, db: Session = Depends(get_session))
     # Handle /start command
     if text == "/start":
         clear_user_state(chat_id)
-        send_start_message(chat_id, user)
-        return {"status": "ok"}
+        await reactivate_user(db, user)
+        await send_command_reply(data)
+        return
 
     # Handle /help command
     if text == "/help":
         clear_user_state(chat_id)
-        send_help_message(chat_id)
-        return {"status": "ok"}
+        await send_command_reply(data)
+        return
 
     # Handle /add command
     if text == "/add":
         state.set_flow(FlowType.REMINDER, ReminderStep.NAME.value)
-        send_message(
+        await send_message(
             settings.bot_token,
             chat_id,
             "✨ Let's create a new reminder!\n\n📝 What should I name it?",
         )
-        return {"status": "ok"}
+        return
 
     # Handle /list command
     if text == "/list":
         clear_user_state(chat_id)
         try:
             stmt = select(Reminders).where(Reminders.chat_id == chat_id_str)
-            reminders = db.exec(stmt).all()
+            reminders = (await db.exec(stmt)).all()
 
             if not reminders:
-                send_message(
+                await send_message(
                     settings.bot_token,
                     chat_id,
                     "You don't have any reminders yet. Use /add to create one!",
                 )
-                return {"status": "ok"}
+                return
 
             message = "📋 Your Reminders:\n\n"
             for i, reminder in enumerate(reminders, 1):
@@ -1173,17 +1348,17 @@ async def telegram_webhook(request: Request, db: Session = Depends(get_session))
                 message += f"{i}. {name} {source}\n"
                 message += f"   {recurring} • Next: {next_time}\n\n"
 
-            send_message(settings.bot_token, chat_id, message)
+            await send_message(settings.bot_token, chat_id, message)
 
         except Exception as e:
             logger.error(f"Failed to list reminders for user {chat_id}: {e}")
-            send_message(
+            await send_message(
                 settings.bot_token,
                 chat_id,
                 "❌ Failed to fetch reminders. Please try again.",
             )
 
-        return {"status": "ok"}
+        return
 
     # Handle /notion command
     if text == "/notion":
@@ -1191,24 +1366,24 @@ async def telegram_webhook(request: Request, db: Session = Depends(get_session))
 
         if has_token:
             state.set_flow(FlowType.NOTION, NotionStep.MENU.value)
-            send_notion_menu(chat_id, user)
+            await send_notion_menu(chat_id, user)
         else:
             state.set_flow(FlowType.NOTION, NotionStep.TOKEN.value)
-            send_notion_menu(chat_id, user)
+            await send_notion_menu(chat_id, user)
 
-        return {"status": "ok"}
+        return
 
     # Handle /settings command
     if text == "/settings":
         state.set_flow(FlowType.SETTINGS, 0)
-        send_settings_menu(chat_id, user)
-        return {"status": "ok"}
+        await send_settings_menu(chat_id, user)
+        return
 
     # Handle /cancel command (exit any flow)
     if text in ("/cancel", "cancel"):
         clear_user_state(chat_id)
-        send_message(settings.bot_token, chat_id, "❌ Cancelled. All progress cleared.")
-        return {"status": "ok"}
+        await send_command_reply(data)
+        return
 
     # ============================================
     # FLOW ROUTING
@@ -1217,19 +1392,19 @@ async def telegram_webhook(request: Request, db: Session = Depends(get_session))
     # Route to appropriate flow handler
     if state.flow_type == FlowType.NOTION:
         await handle_notion_flow(chat_id, text, user, state, db)
-        return {"status": "ok"}
+        return
 
     elif state.flow_type == FlowType.SETTINGS:
         await handle_settings_flow(chat_id, text, user, state, db)
-        return {"status": "ok"}
+        return
 
     elif state.flow_type == FlowType.REMINDER:
         await handle_reminder_flow(chat_id, text, state, db)
-        return {"status": "ok"}
+        return
 
     # No active flow - show help
     else:
-        send_message(
+        await send_message(
             settings.bot_token,
             chat_id,
             "I didn't understand that command. 🤔\n\n"
@@ -1241,7 +1416,7 @@ async def telegram_webhook(request: Request, db: Session = Depends(get_session))
             "• /settings - Configure settings\n"
             "• /help - Detailed help",
         )
-        return {"status": "ok"}
+        return
 
 
 # ============================================
@@ -1253,13 +1428,14 @@ class SettingsPayload(BaseModel):
     chat_id: str
     notion_enabled: Optional[bool] = None
     notion_check_frequence: Optional[int] = None
+    digest_window_minutes: Optional[int] = None
 
 
 @router.get("/settings/{chat_id}")
-def get_settings(chat_id: str, db: Session = Depends(get_session)):
+async def get_settings(chat_id: str, db: AsyncSession = Depends(get_session)):
     """Get user settings."""
     try:
-        user = db.get(Users, str(chat_id))
+        user = await db.get(Users, str(chat_id))
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
 
@@ -1272,6 +1448,7 @@ def get_settings(chat_id: str, db: Session = Depends(get_session)):
             "notion_db_mappings": user.notion_db_mappings or [],
             "notion_check_frequence": getattr(user, "notion_check_frequence", 12),
             "has_notion_token": bool(user.notion_api_key),
+            "digest_window_minutes": user.digest_window_minutes or 0,
             "last_active_at": (
                 user.last_active_at.isoformat() if user.last_active_at else None
             ),
@@ -1284,10 +1461,10 @@ def get_settings(chat_id: str, db: Session = Depends(get_session)):
 
 
 @router.post("/settings")
-def update_settings(payload: SettingsPayload, db: Session = Depends(get_session)):
+async def update_settings(payload: SettingsPayload, db: AsyncSession = Depends(get_session)):
     """Update user settings."""
     try:
-        user = db.get(Users, str(payload.chat_id))
+        user = await db.get(Users, str(payload.chat_id))
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
 
@@ -1305,10 +1482,20 @@ def update_settings(payload: SettingsPayload, db: Session = Depends(get_session)
             user.notion_check_frequence = int(payload.notion_check_frequence)
             changed = True
 
+        if payload.digest_window_minutes is not None:
+            max_window = settings.digest_max_window_minutes
+            if not 0 <= payload.digest_window_minutes <= max_window:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Invalid digest window. Allowed values: 0-{max_window} minutes",
+                )
+            user.digest_window_minutes = int(payload.digest_window_minutes)
+            changed = True
+
         if changed:
             db.add(user)
-            db.commit()
-            db.refresh(user)
+            await db.commit()
+            await db.refresh(user)
 
         return {
             "status": "ok",
@@ -1318,6 +1505,7 @@ def update_settings(payload: SettingsPayload, db: Session = Depends(get_session)
             "settings": {
                 "notion_enabled": bool(user.notion_enabled),
                 "notion_check_frequence": getattr(user, "notion_check_frequence", 12),
+                "digest_window_minutes": user.digest_window_minutes or 0,
             },
         }
 
@@ -1329,10 +1517,10 @@ def update_settings(payload: SettingsPayload, db: Session = Depends(get_session)
 
 
 @router.delete("/settings/{chat_id}/notion")
-def reset_notion_integration(chat_id: str, db: Session = Depends(get_session)):
+async def reset_notion_integration(chat_id: str, db: AsyncSession = Depends(get_session)):
     """Reset Notion integration for a user."""
     try:
-        user = db.get(Users, str(chat_id))
+        user = await db.get(Users, str(chat_id))
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
 
@@ -1342,7 +1530,7 @@ def reset_notion_integration(chat_id: str, db: Session = Depends(get_session)):
         user.notion_db_mappings = []
 
         db.add(user)
-        db.commit()
+        await db.commit()
 
         return {"status": "ok", "message": "Notion integration reset successfully"}
 
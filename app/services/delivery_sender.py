@@ -0,0 +1,474 @@
+"""Sender stage: drain the ``reminder_deliveries`` outbox into Telegram.
+
+The scheduler stage (``notification_worker``) only moves due reminders into
+the outbox. This stage claims pending deliveries with a lease, sends them
+with no transaction open and records the outcome, so a Telegram outage
+backs up the outbox without holding up rescheduling.
+
+Deliveries are held until their ``not_before`` time: the scheduler writes
+them a few seconds ahead (and, with jitter, spread across a tolerance), and
+the sender wakes when the next one is released.
+
+Chats with a digest window (``Users.digest_window_minutes``) get their
+reminders due within the window written together by the scheduler, all
+released at the earliest one's time; the sender merges a digest chat's
+claimed deliveries into as few messages as fit Telegram's length limit.
+"""
+import asyncio
+import datetime
+import os
+import socket
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+import pytz
+from sqlalchemy import exists, func, or_, update
+from sqlalchemy.orm import aliased
+from sqlmodel import select
+
+from app.constants.constants import settings
+from app.db import config_db
+from app.db.models import ReminderDeliveries, Reminders, Users
+from app.services.dispatcher import NotSent, dispatch
+from app.services.telegram import (
+    error_class,
+    error_description,
+    is_chat_unreachable,
+    is_permanent_error,
+    send_message,
+)
+from app.utils.logging_utils import logger
+from app.utils.message_utils import digest_units
+from app.utils.metrics import Counter, Gauge, Histogram
+from app.utils.retry import backoff_delay
+
+
+# Identifies this process in delivery claims (ReminderDeliveries.claimed_by)
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+# Set by the scheduler stage whenever it writes new deliveries
+outbox_ready = asyncio.Event()
+
+# Telegram sends in flight at once; taken after the chat's rate limit allows
+# the send, so chats waiting for their next message don't hold slots
+send_slots = asyncio.Semaphore(max(1, settings.worker_send_concurrency))
+
+delivery_lag_seconds = Histogram(
+    "remindarr_delivery_lag_seconds",
+    "Time from a reminder's trigger time to Telegram accepting the message",
+    buckets=(0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0, 3600.0),
+)
+send_latency_seconds = Histogram(
+    "remindarr_send_latency_seconds",
+    "Duration of one Telegram sendMessage call, including rate-limit waits",
+)
+send_batch_size = Histogram(
+    "remindarr_sender_batch_size",
+    "Deliveries claimed per sender batch",
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000),
+)
+deliveries_total = Counter(
+    "remindarr_deliveries_total",
+    "Delivery attempts by outcome (sent, retry, dead)",
+    ["outcome"],
+)
+send_failures_total = Counter(
+    "remindarr_send_failures_total",
+    "Failed delivery attempts by error class",
+    ["error"],
+)
+outbox_pending = Gauge(
+    "remindarr_outbox_pending",
+    "Pending deliveries in the outbox (updated on scrape)",
+)
+outbox_overdue = Gauge(
+    "remindarr_outbox_overdue",
+    "Pending deliveries already past their release time (updated on scrape)",
+)
+
+
+def notify_outbox() -> None:
+    """Wake the sender after new deliveries were committed."""
+    outbox_ready.set()
+
+
+def _release_at():
+    """When a delivery may first be sent (rows from before jitter have no not_before)."""
+    return func.coalesce(ReminderDeliveries.not_before, ReminderDeliveries.scheduled_for)
+
+
+async def _next_release(utc_now: datetime.datetime) -> Optional[datetime.datetime]:
+    """Release time of the next pending delivery still held back, if any."""
+    stmt = (
+        select(func.min(ReminderDeliveries.not_before))
+        .where(ReminderDeliveries.status == "pending")
+        .where(ReminderDeliveries.not_before > utc_now)
+    )
+    async with config_db.async_session() as db:
+        return (await db.exec(stmt)).one()
+
+
+def _per_chat_claim_limit() -> int:
+    """Most deliveries one chat may have in a claim.
+
+    The per-chat rate limit paces a chat's sends, so a batch holding more
+    of one chat's deliveries than fit in half the lease would outlive its
+    claims and another worker would send them again.
+    """
+    return max(1, int(settings.worker_claim_lease_seconds * settings.telegram_chat_rate / 2))
+
+
+async def _claim_pending(utc_now: datetime.datetime) -> List[Tuple[ReminderDeliveries, int]]:
+    """Claim a batch of pending deliveries for this worker in one short transaction.
+
+    Returns (delivery, the chat's digest window in minutes) pairs. A chat with a live claim held by
+    any sender is skipped, so each chat is sent to by one sender at a time
+    (in order, within its rate limit), and no chat gets more than
+    ``_per_chat_claim_limit()`` deliveries per batch.
+    """
+    claimed_until = utc_now + datetime.timedelta(seconds=settings.worker_claim_lease_seconds)
+
+    digest_window = func.coalesce(Users.digest_window_minutes, 0)
+    other = aliased(ReminderDeliveries)
+    chat_busy = exists().where(
+        other.chat_id == ReminderDeliveries.chat_id,
+        other.status == "pending",
+        other.claimed_until != None,
+        other.claimed_until >= utc_now,
+    )
+
+    # The earliest claimable deliveries, walked in ix_reminder_deliveries_pending
+    # order; only these are ranked, so a claim costs the same however large
+    # the backlog. FOR UPDATE can't be combined with a window function, so
+    # ranking happens here and the outer query locks.
+    candidates = (
+        select(ReminderDeliveries.id, ReminderDeliveries.chat_id, ReminderDeliveries.scheduled_for)
+        .where(ReminderDeliveries.status == "pending")
+        .where(_release_at() <= utc_now)
+        .where(or_(ReminderDeliveries.next_retry_at == None, ReminderDeliveries.next_retry_at <= utc_now))
+        .where(or_(ReminderDeliveries.claimed_until == None, ReminderDeliveries.claimed_until < utc_now))
+        .where(~chat_busy)
+        .order_by(ReminderDeliveries.scheduled_for, ReminderDeliveries.id)
+        .limit(settings.worker_claim_batch_size)
+        .subquery()
+    )
+    ranked = select(
+        candidates.c.id,
+        func.row_number()
+        .over(partition_by=candidates.c.chat_id, order_by=(candidates.c.scheduled_for, candidates.c.id))
+        .label("chat_rank"),
+    ).subquery()
+    first_per_chat = select(ranked.c.id).where(ranked.c.chat_rank <= _per_chat_claim_limit())
+
+    # No LIMIT here: the candidates already bound the batch, and a limit could
+    # lock only part of a chat's first rows, letting another sender claim the rest
+    stmt = (
+        select(ReminderDeliveries, digest_window)
+        .outerjoin(Users, Users.chat_id == ReminderDeliveries.chat_id)
+        .where(ReminderDeliveries.id.in_(first_per_chat))
+        .where(ReminderDeliveries.status == "pending")
+        .where(or_(ReminderDeliveries.claimed_until == None, ReminderDeliveries.claimed_until < utc_now))
+        .order_by(ReminderDeliveries.scheduled_for, ReminderDeliveries.id)
+        .with_for_update(skip_locked=True, of=ReminderDeliveries)
+    )
+
+    # async_session keeps the loaded objects usable after commit; they are only read while sending
+    async with config_db.async_session() as db:
+        rows = (await db.exec(stmt)).all()
+        for delivery, _ in rows:
+            delivery.claimed_by = WORKER_ID
+            delivery.claimed_until = claimed_until
+            db.add(delivery)
+        await db.commit()
+
+    return [(delivery, window) for delivery, window in rows]
+
+
+def _group_messages(claimed: List[Tuple[ReminderDeliveries, int]]) -> List[Tuple[List[ReminderDeliveries], List[str]]]:
+    """Group claimed deliveries into (deliveries, message parts) to send.
+
+    Deliveries for digest chats are merged per chat and split into
+    ``digest_units``, so a failed part is retried without resending the
+    parts before it; everything else is sent on its own.
+    """
+    groups: List[Tuple[List[ReminderDeliveries], List[str]]] = []
+    digests: Dict[str, List[ReminderDeliveries]] = {}
+
+    for delivery, window in claimed:
+        if window:
+            if delivery.chat_id not in digests:
+                digests[delivery.chat_id] = []
+                groups.append((digests[delivery.chat_id], []))
+            digests[delivery.chat_id].append(delivery)
+        else:
+            groups.append(([delivery], [delivery.message]))
+
+    # digest chats are expanded into their units where they first appeared
+    expanded: List[Tuple[List[ReminderDeliveries], List[str]]] = []
+    for deliveries, parts in groups:
+        if parts:
+            expanded.append((deliveries, parts))
+            continue
+        units = digest_units([delivery.message for delivery in deliveries])
+        expanded.extend(([deliveries[index] for index in indexes], unit_parts) for indexes, unit_parts in units)
+    return expanded
+
+
+async def _send_parts(chat_id: str, parts: List[str]) -> None:
+    for part in parts:
+        started = time.monotonic()
+        try:
+            await send_message(settings.bot_token, chat_id, part, slot=send_slots)
+        finally:
+            send_latency_seconds.observe(time.monotonic() - started)
+
+
+async def _record_results(sent: List[tuple], utc_now: datetime.datetime) -> None:
+    """Record send outcomes in one short transaction.
+
+    Transient failures are retried with exponential backoff; permanent ones,
+    and deliveries out of attempts, are dead-lettered. Chats that blocked the
+    bot or no longer exist are suspended as well.
+    """
+    unreachable_chats = set()
+    outcomes = []
+
+    async with config_db.async_session() as db:
+        for delivery, error in sent:
+            row = await db.get(ReminderDeliveries, delivery.id)
+            # the lease expired and another worker took over; it owns the row now
+            if row is None or row.claimed_by != WORKER_ID:
+                continue
+
+            row.claimed_by = None
+            row.claimed_until = None
+
+            # stopped by shutdown: release the claim so another worker sends it
+            if isinstance(error, NotSent):
+                outcomes.append(("released", None, None))
+                if error.started:
+                    logger.warning(
+                        f"Delivery {row.id} was interrupted by shutdown and may be sent twice"
+                    )
+                db.add(row)
+                continue
+
+            row.attempt_count += 1
+            if error is None:
+                row.status = "sent"
+                row.sent_at = utc_now
+                row.next_retry_at = None
+                outcomes.append(("sent", None, (utc_now - row.scheduled_for).total_seconds()))
+            elif is_permanent_error(error) or row.attempt_count >= settings.outbox_max_attempts:
+                row.status = "dead"
+                row.last_error = error_description(error)
+                if is_chat_unreachable(error):
+                    unreachable_chats.add(row.chat_id)
+                outcomes.append(("dead", error_class(error), None))
+                logger.error(
+                    f"Dead-lettered delivery {row.id} (reminder {row.reminder_id}) "
+                    f"after {row.attempt_count} attempt(s): {row.last_error}"
+                )
+            else:
+                row.last_error = error_description(error)
+                delay = backoff_delay(
+                    row.attempt_count,
+                    settings.outbox_retry_base_seconds,
+                    settings.outbox_retry_max_seconds,
+                )
+                row.next_retry_at = utc_now + datetime.timedelta(seconds=delay)
+                outcomes.append(("retry", error_class(error), None))
+                logger.warning(
+                    f"Failed to send delivery {row.id} (reminder {row.reminder_id}), "
+                    f"retrying in {delay:.0f}s: {row.last_error}"
+                )
+            db.add(row)
+
+        if unreachable_chats:
+            await _suspend_chats(db, unreachable_chats)
+        await db.commit()
+
+    for outcome, error, lag in outcomes:
+        if outcome == "released":
+            continue
+        deliveries_total.inc(outcome=outcome)
+        if error is not None:
+            send_failures_total.inc(error=error)
+        if lag is not None:
+            delivery_lag_seconds.observe(max(0.0, lag))
+
+
+async def _suspend_chats(db, chat_ids: Set[str]) -> None:
+    """Stop delivering to chats that blocked the bot or were deleted.
+
+    Disables notifications on the users, suspends their reminders in one bulk
+    UPDATE and dead-letters anything still queued for them. ``/start``
+    reactivates the chat.
+    """
+    chat_ids = list(chat_ids)
+    await db.exec(
+        update(Users)
+        .where(Users.chat_id.in_(chat_ids))
+        .values(notifications_enabled=False)
+    )
+    await db.exec(
+        update(Reminders)
+        .where(Reminders.chat_id.in_(chat_ids))
+        .where(Reminders.active == True)
+        .values(suspended=True)
+    )
+    await db.exec(
+        update(ReminderDeliveries)
+        .where(ReminderDeliveries.chat_id.in_(chat_ids))
+        .where(ReminderDeliveries.status == "pending")
+        .values(status="dead", last_error="chat unreachable", claimed_by=None, claimed_until=None)
+    )
+    logger.warning(f"Suspended reminders for unreachable chats: {', '.join(chat_ids)}")
+
+
+async def _send_chat(
+    chat_id: str, groups: List[Tuple[List[ReminderDeliveries], List[str]]], stop_event: asyncio.Event
+) -> None:
+    """Send one chat's claimed deliveries in order, then record their outcomes.
+
+    Setting ``stop_event`` stops new sends and gives the one in flight
+    ``shutdown_grace_seconds``; unsent deliveries are released.
+    """
+    # each digest unit succeeds or fails on its own
+    results = await dispatch(
+        groups,
+        key=lambda group: chat_id,
+        send=lambda group: _send_parts(chat_id, group[1]),
+        concurrency=None,
+        stop_event=stop_event,
+        grace_seconds=settings.shutdown_grace_seconds,
+    )
+    sent = [(delivery, error) for (deliveries, _), error in results for delivery in deliveries]
+    try:
+        await _record_results(sent, datetime.datetime.now(pytz.UTC))
+    except Exception as e:
+        # the claims lapse with their lease and the deliveries are sent again
+        logger.error(f"Could not record deliveries sent to chat {chat_id}: {e}")
+
+
+def _forget(active: Dict[str, asyncio.Task], chat_id: str, task: asyncio.Task) -> None:
+    # the chat may already have been claimed again by a newer task
+    if active.get(chat_id) is task:
+        del active[chat_id]
+
+
+async def claim_pending_deliveries(active: Dict[str, asyncio.Task], stop_event: asyncio.Event) -> int:
+    """Claim a batch of pending deliveries and start sending it; returns how many were claimed.
+
+    Each chat in the batch gets its own task in ``active``, which records
+    that chat's results as soon as it is done, so one slow chat never holds
+    up the others or the next claim. Tasks remove themselves when finished.
+    """
+    if stop_event.is_set():
+        return 0
+
+    claimed = await _claim_pending(datetime.datetime.now(pytz.UTC))
+    if not claimed:
+        return 0
+    send_batch_size.observe(len(claimed))
+
+    by_chat: Dict[str, List[Tuple[List[ReminderDeliveries], List[str]]]] = {}
+    for group in _group_messages(claimed):
+        by_chat.setdefault(group[0][0].chat_id, []).append(group)
+
+    for chat_id, groups in by_chat.items():
+        task = asyncio.create_task(_send_chat(chat_id, groups, stop_event))
+        task.add_done_callback(lambda done, chat_id=chat_id: _forget(active, chat_id, done))
+        active[chat_id] = task
+    return len(claimed)
+
+
+async def _queue_depth() -> Tuple[int, int]:
+    """(pending, overdue) delivery counts."""
+    utc_now = datetime.datetime.now(pytz.UTC)
+    stmt = (
+        select(func.count(), func.count().filter(_release_at() <= utc_now))
+        .select_from(ReminderDeliveries)
+        .where(ReminderDeliveries.status == "pending")
+    )
+    async with config_db.async_session() as db:
+        return tuple((await db.exec(stmt)).one())
+
+
+async def refresh_queue_depth() -> None:
+    """Update the outbox depth gauges; called when metrics are scraped."""
+    pending, overdue = await _queue_depth()
+    outbox_pending.set(pending)
+    outbox_overdue.set(overdue)
+
+
+async def _drain_on_shutdown() -> None:
+    """Release any claims this worker still holds and log what is left pending."""
+    stmt = (
+        update(ReminderDeliveries)
+        .where(ReminderDeliveries.claimed_by == WORKER_ID)
+        .where(ReminderDeliveries.status == "pending")
+        .values(claimed_by=None, claimed_until=None)
+    )
+    async with config_db.async_session() as db:
+        released = (await db.exec(stmt)).rowcount
+        await db.commit()
+    if released:
+        logger.warning(f"Released {released} claimed delivery(ies) on shutdown")
+
+    pending, overdue = await _queue_depth()
+    logger.info(f"Sender stopped; {pending} delivery(ies) pending in the outbox ({overdue} overdue)")
+
+
+async def _sender_loop(stop_event: asyncio.Event) -> None:
+    """Background loop: keep claiming while chats are free to send, and claim
+    again whenever the outbox is notified, a chat finishes or the poll interval passes."""
+    active: Dict[str, asyncio.Task] = {}
+
+    while not stop_event.is_set():
+        # clear before claiming so deliveries written meanwhile still wake us
+        outbox_ready.clear()
+        try:
+            # claims skip chats already being sent to, so each one brings new
+            # chats; stop once enough are in flight to fill the send slots
+            while len(active) < settings.worker_send_concurrency:
+                if not await claim_pending_deliveries(active, stop_event):
+                    break
+        except Exception as e:
+            logger.error(f"Delivery sender error: {e}")
+
+        # the poll picks up retries and deliveries written by other processes;
+        # deliveries written ahead of time wake us when they are released
+        timeout = settings.outbox_poll_seconds
+        try:
+            utc_now = datetime.datetime.now(pytz.UTC)
+            release_at = await _next_release(utc_now)
+            if release_at is not None:
+                # the floor batches jittered deliveries released close together
+                timeout = min(timeout, max(0.1, (release_at - utc_now).total_seconds()))
+        except Exception as e:
+            logger.error(f"Delivery sender error: {e}")
+
+        waiters = [
+            asyncio.ensure_future(stop_event.wait()),
+            asyncio.ensure_future(outbox_ready.wait()),
+        ]
+        try:
+            await asyncio.wait(
+                waiters + list(active.values()), timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+            )
+        finally:
+            for waiter in waiters:
+                waiter.cancel()
+
+    # chats in flight stop on their own within the grace period
+    await asyncio.gather(*active.values(), return_exceptions=True)
+    try:
+        await _drain_on_shutdown()
+    except Exception as e:
+        logger.error(f"Could not release delivery claims on shutdown: {e}")
+
+
+def start_sender(stop_event: asyncio.Event) -> asyncio.Task:
+    """Start the sender background task. Call from inside the running event loop."""
+    return asyncio.create_task(_sender_loop(stop_event))
@@ -0,0 +1,96 @@
+"""Concurrent reminder dispatch.
+
+Sends are grouped by chat: messages for one chat go out strictly in order,
+while different chats are sent in parallel up to a concurrency limit.
+
+A dispatch can be stopped: items not yet started are skipped, and sends in
+flight get a grace period to finish before they are cancelled.
+"""
+import asyncio
+import contextlib
+from typing import Awaitable, Callable, Dict, Hashable, List, Optional, Sequence, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class NotSent(Exception):
+    """Reported for items a stopped dispatch did not (or may not have) sent.
+
+    ``started`` is True when the send was cancelled midway, so the message
+    may or may not have gone out.
+    """
+
+    def __init__(self, started: bool = False):
+        super().__init__("interrupted by shutdown" if started else "skipped by shutdown")
+        self.started = started
+
+
+async def dispatch(
+    items: Sequence[T],
+    key: Callable[[T], Hashable],
+    send: Callable[[T], Awaitable[None]],
+    concurrency: Optional[int],
+    stop_event: Optional[asyncio.Event] = None,
+    grace_seconds: float = 0.0,
+) -> List[Tuple[T, Optional[Exception]]]:
+    """Send ``items`` with at most ``concurrency`` sends in flight.
+
+    Items sharing a ``key`` (chat id) are sent one after another in the order
+    given; a failed send does not stop the rest of that chat's items.
+
+    Once ``stop_event`` is set no new sends start, and sends in flight are
+    cancelled if they take longer than ``grace_seconds`` to finish; both are
+    reported with a ``NotSent`` error.
+
+    With ``concurrency`` None sends are not limited here; pass ``send`` a
+    shared semaphore instead when it should take its slot only after a wait
+    (such as a chat's rate limit) that shouldn't hold one.
+
+    Returns ``(item, error)`` pairs in input order, ``error`` being None on success.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency)) if concurrency is not None else None
+    errors: Dict[int, Optional[Exception]] = {}
+
+    # group item positions by chat, keeping their original order
+    by_key: Dict[Hashable, List[int]] = {}
+    for index, item in enumerate(items):
+        by_key.setdefault(key(item), []).append(index)
+
+    async def _send_chain(indexes: List[int]) -> None:
+        for index in indexes:
+            # acquire per message so one busy chat can't hold a slot for its whole queue
+            async with semaphore or contextlib.nullcontext():
+                if stop_event is not None and stop_event.is_set():
+                    errors[index] = NotSent()
+                    continue
+                try:
+                    await send(items[index])
+                    errors[index] = None
+                except asyncio.CancelledError:
+                    errors[index] = NotSent(started=True)
+                    raise
+                except Exception as e:
+                    errors[index] = e
+
+    chains = [asyncio.ensure_future(_send_chain(indexes)) for indexes in by_key.values()]
+    if stop_event is None:
+        await asyncio.gather(*chains)
+    else:
+        pending = set(chains)
+        stopper = asyncio.ensure_future(stop_event.wait())
+        try:
+            while pending and not stop_event.is_set():
+                _, pending = await asyncio.wait(pending | {stopper}, return_when=asyncio.FIRST_COMPLETED)
+                pending.discard(stopper)
+        finally:
+            stopper.cancel()
+
+        if pending:
+            # stopping: give sends in flight the grace period, then cancel them
+            _, pending = await asyncio.wait(pending, timeout=grace_seconds)
+            for chain in pending:
+                chain.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    # items after an interrupted send in the same chain never started
+    return [(item, errors.get(index, NotSent())) for index, item in enumerate(items)]
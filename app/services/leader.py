@@ -0,0 +1,180 @@
+"""Leader election for the scheduler stage across app instances.
+
+Every process (uvicorn worker, container) runs the outbox sender, but only
+the one holding a PostgreSQL advisory lock runs the scheduler stage. The
+lock is session-level and held on a dedicated connection, so it is released
+the moment the leader's process or connection dies; followers retry it on
+every heartbeat and take over within about one interval.
+
+Each instance also upserts a row in ``worker_heartbeats``, which is how
+``/health`` reports the current leader.
+"""
+import asyncio
+import datetime
+from typing import Awaitable, Callable, Optional
+
+import pytz
+from sqlalchemy import delete, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import select
+
+from app.constants.constants import settings
+from app.db import config_db
+from app.db.models import WorkerHeartbeats
+from app.services.delivery_sender import WORKER_ID
+from app.utils.logging_utils import logger
+
+STARTED_AT = datetime.datetime.now(pytz.UTC)
+
+_is_leader = False
+
+
+def is_leader() -> bool:
+    """Whether this instance currently runs the scheduler stage."""
+    return _is_leader
+
+
+async def _heartbeat(utc_now: datetime.datetime) -> None:
+    """Record that this instance is alive, and whether it leads."""
+    stmt = insert(WorkerHeartbeats).values(
+        instance_id=WORKER_ID,
+        started_at=STARTED_AT,
+        last_seen_at=utc_now,
+        is_leader=_is_leader,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[WorkerHeartbeats.instance_id],
+        set_={"last_seen_at": stmt.excluded.last_seen_at, "is_leader": stmt.excluded.is_leader},
+    )
+    async with config_db.async_session() as db:
+        await db.exec(stmt)
+        if _is_leader:
+            # instances that stopped heartbeating long ago
+            retention = datetime.timedelta(seconds=settings.heartbeat_retention_seconds)
+            await db.exec(delete(WorkerHeartbeats).where(WorkerHeartbeats.last_seen_at < utc_now - retention))
+        await db.commit()
+
+
+async def current_leader() -> Optional[str]:
+    """Instance id of the leader, if one heartbeated recently."""
+    fresh_after = datetime.datetime.now(pytz.UTC) - datetime.timedelta(
+        seconds=3 * settings.heartbeat_interval_seconds
+    )
+    stmt = (
+        select(WorkerHeartbeats.instance_id)
+        .where(WorkerHeartbeats.is_leader == True)
+        .where(WorkerHeartbeats.last_seen_at >= fresh_after)
+        .order_by(WorkerHeartbeats.last_seen_at.desc())
+        .limit(1)
+    )
+    async with config_db.async_session() as db:
+        return (await db.exec(stmt)).first()
+
+
+async def _try_lock():
+    """Take the advisory lock; returns the connection holding it, or None."""
+    conn = await config_db.async_engine.connect()
+    try:
+        acquired = (
+            await conn.execute(
+                text("SELECT pg_try_advisory_lock(hashtext(:name))"),
+                {"name": settings.leader_lock_name},
+            )
+        ).scalar()
+        # end the implicit transaction; the session-level lock outlives it
+        await conn.commit()
+    except Exception:
+        await conn.close()
+        raise
+
+    if not acquired:
+        await conn.close()
+        return None
+    return conn
+
+
+async def _release_lock(conn) -> None:
+    """Drop the lock connection; invalidating it guarantees the lock is released."""
+    try:
+        await conn.invalidate()
+    finally:
+        await conn.close()
+
+
+async def _election_loop(stop_event: asyncio.Event, lead: Callable[[asyncio.Event], Awaitable[None]]) -> None:
+    """Heartbeat, contend for the lock, and run ``lead`` for as long as we hold it."""
+    global _is_leader
+    lock_conn = None
+    term_stop: Optional[asyncio.Event] = None
+    term_task: Optional[asyncio.Task] = None
+
+    async def _step_down() -> None:
+        nonlocal lock_conn, term_stop, term_task
+        global _is_leader
+        _is_leader = False
+        if term_task is not None:
+            task = term_task
+            term_stop.set()
+            term_stop, term_task = None, None
+            # the term may have failed already; its error must not stop the election
+            (error,) = await asyncio.gather(task, return_exceptions=True)
+            if isinstance(error, BaseException):
+                logger.error(f"Scheduler term failed: {error!r}")
+        if lock_conn is not None:
+            try:
+                await _release_lock(lock_conn)
+            except Exception as e:
+                logger.warning(f"Could not release scheduler lock connection: {e}")
+            lock_conn = None
+
+    try:
+        while not stop_event.is_set():
+            if term_task is not None and term_task.done():
+                # holding the lock without a running scheduler would stop
+                # reminders everywhere; step down so the lock is contended again
+                logger.error("Scheduler stopped while this instance leads; stepping down")
+                await _step_down()
+
+            try:
+                if lock_conn is None:
+                    lock_conn = await _try_lock()
+                    if lock_conn is not None:
+                        _is_leader = True
+                        logger.info(f"Instance {WORKER_ID} is now the scheduler leader")
+                        term_stop = asyncio.Event()
+                        term_task = asyncio.create_task(lead(term_stop))
+                else:
+                    # a dead lock connection means the lock is gone too
+                    await lock_conn.execute(text("SELECT 1"))
+                    await lock_conn.commit()
+            except Exception as e:
+                if _is_leader:
+                    logger.error(f"Lost scheduler leadership: {e}")
+                    await _step_down()
+                else:
+                    logger.error(f"Leader election error: {e}")
+
+            try:
+                await _heartbeat(datetime.datetime.now(pytz.UTC))
+            except Exception as e:
+                logger.warning(f"Heartbeat failed: {e}")
+
+            try:
+                await asyncio.wait_for(stop_event.wait(), timeout=settings.heartbeat_interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        await _step_down()
+        # tell other instances we no longer lead
+        try:
+            await _heartbeat(datetime.datetime.now(pytz.UTC))
+        except Exception as e:
+            logger.warning(f"Heartbeat failed: {e}")
+
+
+def start_election(
+    stop_event: asyncio.Event, lead: Callable[[asyncio.Event], Awaitable[None]]
+) -> asyncio.Task:
+    """Start leader election. ``lead(term_stop)`` runs while this instance leads
+    and must return once ``term_stop`` is set. Call from inside the running event loop."""
+    return asyncio.create_task(_election_loop(stop_event, lead))
@@ -1,117 +1,417 @@
+"""Scheduler stage: move due reminders into the ``reminder_deliveries`` outbox.
+
+Only the elected leader (see ``leader``) runs this stage; every instance
+runs the sender.
+
+Each batch of due reminders is turned into deliveries and rescheduled in a
+single short transaction; ``delivery_sender`` then does the actual sending.
+Queries go through the asyncpg engine, so they never block the event loop
+that also serves webhooks.
+"""
 import asyncio
 import datetime
-from typing import Optional
+import random
+from typing import List, Optional, Tuple
 import pytz
 
+from sqlalchemy import Boolean, String, and_, cast, column, insert, or_, text, update, values
 from sqlmodel import select
 
 from app.db import config_db
-from app.db.models import Reminders, Users
+from app.db.models import ReminderDeliveries, Reminders, Users, UTCDateTime
 from app.constants.constants import settings
-from app.services.telegram import send_message
+from app.services.delivery_sender import notify_outbox, start_sender
+from app.services.leader import start_election
+from app.services.reminder_notify import start_listener
+from app.services.scheduler import scheduler
 from app.utils.logging_utils import logger
-from app.utils.time_utils import format_datetime_for_user
+from app.utils.metrics import Histogram
+from app.utils.time_utils import catch_up_occurrences, format_datetime_for_user
+
+# How long the scheduler waits before retrying after a failed iteration
+SCHEDULER_RETRY_SECONDS = 5
+
+
+scheduler_chunk_size = Histogram(
+    "remindarr_scheduler_chunk_size",
+    "Due reminders fetched per scheduler chunk",
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000),
+)
+enqueue_lag_seconds = Histogram(
+    "remindarr_enqueue_lag_seconds",
+    "How late a due reminder was moved into the outbox (0 when enqueued ahead)",
+    buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 3600.0),
+)
+
+
+async def _fetch_upcoming(horizon: datetime.datetime) -> List[Tuple[str, datetime.datetime]]:
+    """Reminders due up to ``horizon`` as (id, next_trigger_at) pairs."""
+    async with config_db.async_session() as db:
+        stmt = (
+            select(Reminders.id, Reminders.next_trigger_at)
+            .where(Reminders.active == True)
+            .where(Reminders.suspended == False)
+            .where(Reminders.next_trigger_at != None)
+            .where(Reminders.next_trigger_at <= horizon)
+        )
+        return list((await db.exec(stmt)).all())
+
+
+async def _load_upcoming(utc_now: datetime.datetime) -> None:
+    """Load reminders due within the lookahead window into the scheduler heap."""
+    horizon = utc_now + datetime.timedelta(seconds=settings.scheduler_lookahead_seconds)
+    rows = await _fetch_upcoming(horizon)
+    scheduler.load(rows, utc_now, horizon)
+
+
+# Keyset cursor over due reminders: (next_trigger_at, id) of the last row seen
+DueCursor = Tuple[datetime.datetime, str]
+
+
+def _reminders_to_send():
+    """Active reminders of enabled users, with the user columns the message needs."""
+    return (
+        select(
+            Reminders.id,
+            Reminders.reminder_content,
+            Reminders.interval_minutes,
+            Reminders.catch_up_policy,
+            Reminders.next_trigger_at,
+            Reminders.jitter_seconds,
+            Reminders.chat_id,
+            Users.timezone,
+            Users.first_name,
+            Users.digest_window_minutes,
+        )
+        .join(Users, Reminders.chat_id == Users.chat_id)
+        .where(Reminders.active == True)
+        .where(Reminders.next_trigger_at != None)
+        .where(Reminders.suspended == False)
+        .where(Users.notifications_enabled == True)
+    )
+
+
+def _due_reminders_stmt(due_by: datetime.datetime, after: Optional[DueCursor] = None):
+    """Due reminders with the user columns the message needs, one chunk at a time.
+
+    The filters mirror the ``ix_reminders_due`` partial index predicate.
+    Chunks are paged by keyset on (next_trigger_at, id) starting after
+    ``after``, so rows a chunk left untouched (skipped, or locked by another
+    worker) are never fetched again. Rows are locked with SKIP LOCKED for the
+    short enqueue transaction, so concurrent workers each get different rows.
+    """
+    stmt = _reminders_to_send().where(Reminders.next_trigger_at <= due_by)
+    if after is not None:
+        after_trigger_at, after_id = after
+        # spelled out instead of a row comparison so the range on
+        # next_trigger_at can use ix_reminders_due
+        stmt = stmt.where(Reminders.next_trigger_at >= after_trigger_at).where(
+            or_(
+                Reminders.next_trigger_at > after_trigger_at,
+                and_(Reminders.next_trigger_at == after_trigger_at, Reminders.id > after_id),
+            )
+        )
+    return (
+        stmt.order_by(Reminders.next_trigger_at, Reminders.id)
+        .limit(settings.scheduler_batch_size)
+        .with_for_update(skip_locked=True, of=Reminders)
+    )
+
 
+def _digest_reminders_stmt(due_by: datetime.datetime, chat_ids: List[str]):
+    """Reminders of digest chats due after ``due_by`` but within the chat's window.
 
-CHECK_INTERVAL_SECONDS = 60  # how often to poll for due reminders
+    They go out together with the chat's reminders that are due now, so a
+    digest brings later reminders forward instead of holding earlier ones back.
+    """
+    return (
+        _reminders_to_send()
+        .where(Reminders.chat_id.in_(chat_ids))
+        .where(Reminders.next_trigger_at > due_by)
+        .where(
+            Reminders.next_trigger_at
+            <= cast(due_by, UTCDateTime) + Users.digest_window_minutes * text("interval '1 minute'")
+        )
+        .with_for_update(skip_locked=True, of=Reminders)
+    )
 
 
-async def _reminder_loop(app) -> None:
-    """Background loop: query due reminders, send messages, reschedule."""
+def check_due_query_plan() -> bool:
+    """Log whether the planner uses the due-reminder index; returns True if it does.
+
+    On small tables PostgreSQL prefers a sequential scan, so a miss is only
+    worth acting on once the reminders table has grown.
+    """
     engine = config_db.engine
-    # use a stop event stored on the app state to allow graceful shutdown
-    stop_event: asyncio.Event = app.state._reminder_stop
+    compiled = _due_reminders_stmt(datetime.datetime.now(pytz.UTC)).compile(engine)
+
+    with engine.connect() as conn:
+        plan = conn.exec_driver_sql(f"EXPLAIN {compiled.string}", compiled.params).scalars().all()
+
+    plan_text = "\n".join(plan)
+    uses_index = "ix_reminders_due" in plan_text
+    if uses_index:
+        logger.info("Due-reminder query uses ix_reminders_due")
+    else:
+        logger.info(f"Due-reminder query does not use ix_reminders_due:\n{plan_text}")
+    return uses_index
+
+
+def _reschedule(row, due_by: datetime.datetime) -> Tuple[List[datetime.datetime], Optional[datetime.datetime]]:
+    """Work out the occurrence times to deliver now and the reminder's next trigger.
+
+    A ``None`` next trigger means the reminder is deactivated: one-time
+    reminders and invalid intervals. Recurring reminders are anchored to
+    their previous ``next_trigger_at`` (not to ``due_by``), so processing
+    delays never shift the series; occurrences missed during downtime are
+    handled by the reminder's catch-up policy.
+    """
+    due_at = row.next_trigger_at
+
+    # Handle one-time vs recurring reminders
+    if row.interval_minutes is None:
+        # One-time reminder: mark inactive after sending
+        return [due_at], None
+
+    if row.interval_minutes <= 0:
+        # Invalid interval (0 or negative): mark inactive
+        logger.warning(f"Reminder {row.id} has invalid interval_minutes: {row.interval_minutes}")
+        return [due_at], None
+
+    # Recurring reminder: schedule next occurrence
+    occurrences, next_trigger_at = catch_up_occurrences(
+        due_at,
+        row.interval_minutes,
+        due_by,
+        row.catch_up_policy,
+        settings.catch_up_max_occurrences,
+    )
+
+    # Log next trigger time in user's timezone
+    next_local = format_datetime_for_user(next_trigger_at, row.timezone)
+    logger.info(
+        f"Scheduled next reminder {row.id} for {next_local} "
+        f"(User: {row.first_name or row.chat_id}, sending {len(occurrences)} now)"
+    )
+    return occurrences, next_trigger_at
+
+
+def _reschedule_stmt(rescheduled: List[Tuple[str, Optional[datetime.datetime]]], utc_now: datetime.datetime):
+    """One ``UPDATE ... FROM (VALUES ...)`` applying a chunk's reschedules and deactivations."""
+    due = values(
+        column("id", String),
+        column("next_trigger_at", UTCDateTime),
+        column("active", Boolean),
+        name="due",
+    ).data([(reminder_id, next_trigger_at, next_trigger_at is not None) for reminder_id, next_trigger_at in rescheduled])
+
+    return (
+        update(Reminders)
+        .where(Reminders.id == due.c.id)
+        .values(
+            # the cast keeps the column typed when every row in the chunk is NULL
+            next_trigger_at=cast(due.c.next_trigger_at, UTCDateTime),
+            active=due.c.active,
+            last_triggered_at=utc_now,
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _not_before(row, occurrence: datetime.datetime) -> datetime.datetime:
+    """Earliest send time for an occurrence: up to its jitter early, at random.
+
+    Jitter spreads reminders due at the same instant (the top of the hour,
+    a Notion import) across the tolerance their owners accept. It is capped
+    by the scheduler lead, which is how early deliveries are written.
+    """
+    jitter = row.jitter_seconds
+    if jitter is None:
+        jitter = settings.reminder_default_jitter_seconds
+    jitter = max(0, min(jitter, settings.scheduler_lead_seconds))
+    return occurrence - datetime.timedelta(seconds=random.uniform(0, jitter))
+
+
+async def _enqueue_due_chunk(
+    utc_now: datetime.datetime, due_by: datetime.datetime, after: Optional[DueCursor]
+) -> Tuple[List[Tuple[str, Optional[datetime.datetime]]], Optional[DueCursor], int]:
+    """Move one chunk of due reminders into the outbox and reschedule them.
+
+    Only the needed columns are read, and the chunk is written back with one
+    bulk INSERT of deliveries and one set-based UPDATE of the reminders, in
+    the same transaction, so a crash leaves either both or neither.
+    Reminders due up to ``due_by`` are included; the sender holds each
+    delivery until its ``not_before``. Chats with a digest window also get
+    their reminders due within the window, released with the earliest of
+    the chat's deliveries so the sender merges them. Returns
+    (reminder_id, new next_trigger_at) for every rescheduled reminder, the
+    cursor to continue from and how many rows the chunk fetched.
+    """
+    async with config_db.async_session() as db:
+        rows = (await db.exec(_due_reminders_stmt(due_by, after))).all()
+        if not rows:
+            return [], after, 0
+
+        cursor = (rows[-1].next_trigger_at, rows[-1].id)
+        scheduler_chunk_size.observe(len(rows))
+        deliveries = []
+        rescheduled = []
+
+        digest_chats = {row.chat_id for row in rows if row.digest_window_minutes}
+        brought_forward = []
+        if digest_chats:
+            brought_forward = (await db.exec(_digest_reminders_stmt(due_by, sorted(digest_chats)))).all()
+
+        for row in [*rows, *brought_forward]:
+            target_chat = row.chat_id or settings.chat_id
+            if not target_chat:
+                logger.error(f"No chat_id available for reminder {row.id}; skipping")
+                continue
+
+            # reminders brought forward into a digest send their next occurrence only
+            occurrences, next_trigger_at = _reschedule(row, max(due_by, row.next_trigger_at))
+            enqueue_lag_seconds.observe(max(0.0, (utc_now - row.next_trigger_at).total_seconds()))
+            for occurrence in occurrences:
+                # Format the reminder time in user's timezone
+                local_time = format_datetime_for_user(occurrence, row.timezone)
+
+                # Add timezone context to the message
+                message = (
+                    f"{row.reminder_content}\n\n"
+                    f"⏰ Triggered at: {local_time}"
+                )
+                deliveries.append(
+                    {
+                        "reminder_id": row.id,
+                        "chat_id": target_chat,
+                        "message": message,
+                        "scheduled_for": occurrence,
+                        "not_before": _not_before(row, occurrence),
+                    }
+                )
+
+            rescheduled.append((row.id, next_trigger_at))
+
+        # a digest chat's deliveries are released together, with its earliest one
+        release_at = {}
+        for delivery in deliveries:
+            if delivery["chat_id"] in digest_chats:
+                chat_id = delivery["chat_id"]
+                release_at[chat_id] = min(release_at.get(chat_id, delivery["not_before"]), delivery["not_before"])
+        for delivery in deliveries:
+            delivery["not_before"] = release_at.get(delivery["chat_id"], delivery["not_before"])
+
+        if deliveries:
+            await db.exec(insert(ReminderDeliveries), params=deliveries)
+        if rescheduled:
+            await db.exec(_reschedule_stmt(rescheduled, utc_now))
+        await db.commit()
+
+    return rescheduled, cursor, len(rows)
+
+
+async def _enqueue_due_reminders(
+    utc_now: datetime.datetime, due_by: datetime.datetime, stop_event: asyncio.Event
+) -> None:
+    """Enqueue every reminder due by ``due_by``, one committed chunk at a time.
+
+    Stops between chunks once ``stop_event`` is set; whatever is left stays
+    due for the next leader.
+    """
+    enqueued = 0
+    cursor: Optional[DueCursor] = None
+    while True:
+        rescheduled, cursor, fetched = await _enqueue_due_chunk(utc_now, due_by, cursor)
+        enqueued += len(rescheduled)
+
+        for reminder_id, next_trigger_at in rescheduled:
+            scheduler.schedule(reminder_id, next_trigger_at)
+
+        # wake the sender per chunk so a large backlog starts draining early
+        if rescheduled:
+            notify_outbox()
+
+        if fetched < settings.scheduler_batch_size or stop_event.is_set():
+            break
+
+    if enqueued:
+        logger.info(f"Enqueued {enqueued} due reminder(s)")
+
+
+async def _reminder_loop(stop_event: asyncio.Event) -> None:
+    """Background loop: sleep until the next reminder is due, enqueue it, reschedule."""
+    # the heap may be stale if this instance led before
+    scheduler.force_reload()
+
+    try:
+        await config_db.run_db(check_due_query_plan)
+    except Exception as e:
+        logger.warning(f"Could not check due-reminder query plan: {e}")
 
     while not stop_event.is_set():
+        max_sleep = settings.scheduler_max_sleep_seconds
         try:
             utc_now = datetime.datetime.now(pytz.UTC)
-            
-            # Use a DB session to select due reminders and lock rows to avoid double-processing
-            with config_db.Session(engine) as db:
-                # Get all due reminders with user info for timezone handling
-                stmt = (
-                    select(Reminders, Users)
-                    .join(Users, Reminders.chat_id == Users.chat_id)
-                    .where(Reminders.active == True)
-                    .where(Reminders.next_trigger_at != None)
-                    .where(Reminders.next_trigger_at <= utc_now)
-                    .with_for_update(skip_locked=True)
-                )
+            # enqueue a little ahead, so spikes are in the outbox before they are due
+            due_by = utc_now + datetime.timedelta(seconds=settings.scheduler_lead_seconds)
 
-                results = db.exec(stmt).all()
-
-                for reminder, user in results:
-                    try:
-                        target_chat = reminder.chat_id or settings.chat_id
-                        if not target_chat:
-                            logger.error(f"No chat_id available for reminder {reminder.id}; skipping")
-                            continue
-
-                        # Format the reminder time in user's timezone
-                        local_time = format_datetime_for_user(utc_now, user.timezone)
-                        
-                        # Add timezone context to the message
-                        message = (
-                            f"{reminder.reminder_content}\n\n"
-                            f"⏰ Triggered at: {local_time}"
-                        )
-                        send_message(settings.bot_token, target_chat, message)
-
-                        # update last_triggered_at
-                        reminder.last_triggered_at = utc_now
-
-                        # Handle one-time vs recurring reminders
-                        if reminder.interval_minutes is None:
-                            # One-time reminder: mark inactive after sending
-                            reminder.active = False
-                            reminder.next_trigger_at = None  # Clear next trigger time
-                        elif reminder.interval_minutes > 0:
-                            # Recurring reminder: schedule next occurrence
-                            reminder.next_trigger_at = utc_now + datetime.timedelta(minutes=reminder.interval_minutes)
-
-                            # Log next trigger time in user's timezone
-                            next_local = format_datetime_for_user(reminder.next_trigger_at, user.timezone)
-                            logger.info(
-                                f"Scheduled next reminder {reminder.id} for {next_local} "
-                                f"(User: {user.first_name or user.chat_id})"
-                            )
-                        else:
-                            # Invalid interval (0 or negative): mark inactive
-                            logger.warning(f"Reminder {reminder.id} has invalid interval_minutes: {reminder.interval_minutes}")
-                            reminder.active = False
-                            reminder.next_trigger_at = None
-
-                        db.add(reminder)
-
-                    except Exception as e:
-                        logger.error(f"Failed to send reminder {reminder.id}: {e}")
-
-                db.commit()
+            # Refresh the lookahead window; this also catches reminders created
+            # outside this process and anything left overdue by downtime
+            if scheduler.needs_reload(utc_now, settings.scheduler_max_sleep_seconds):
+                await _load_upcoming(utc_now)
+
+            # The heap only tells us *when* to look; the DB query decides what is enqueued
+            if scheduler.pop_due(due_by):
+                await _enqueue_due_reminders(utc_now, due_by, stop_event)
 
         except Exception as e:
             logger.error(f"Reminder worker error: {e}")
+            # reminders popped from the heap may not have been enqueued;
+            # re-read the window from the DB soon instead of at the next reload
+            scheduler.force_reload()
+            max_sleep = SCHEDULER_RETRY_SECONDS
 
-        # Sleep but wake earlier if stop signal set
-        try:
-            await asyncio.wait_for(stop_event.wait(), timeout=CHECK_INTERVAL_SECONDS)
-        except asyncio.TimeoutError:
-            # timeout expired, loop again
-            continue
+        # Sleep until the next reminder is within the lead window, a new earlier
+        # one is scheduled, or the stop signal is set
+        await scheduler.wait(stop_event, max_sleep, settings.scheduler_lead_seconds)
+
+
+async def _lead(term_stop: asyncio.Event) -> None:
+    """Run the scheduler stage for one leadership term."""
+    await asyncio.gather(_reminder_loop(term_stop), start_listener(term_stop))
 
 
 def start_worker(app) -> None:
-    """Start the reminder background task. Call from an async startup handler."""
-    # create stop event and background task
+    """Start the sender and leader-election background tasks. Call from an async startup handler."""
+    # create stop event and background tasks; they share the stop event but
+    # otherwise run (and fail) independently. The scheduler stage runs only
+    # while this instance is the elected leader.
     app.state._reminder_stop = asyncio.Event()
-    app.state._reminder_task = asyncio.create_task(_reminder_loop(app))
+    app.state._sender_task = start_sender(app.state._reminder_stop)
+    app.state._leader_task = start_election(app.state._reminder_stop, _lead)
 
 
 async def stop_worker(app) -> None:
-    """Signal the worker to stop and await its completion. Call from async shutdown handler."""
+    """Signal the worker to stop and await its completion. Call from async shutdown handler.
+
+    No new work is claimed once stopping; sends in flight get
+    ``shutdown_grace_seconds``, after which the tasks are cancelled.
+    """
     if not hasattr(app.state, "_reminder_stop"):
         return
     app.state._reminder_stop.set()
-    # await task if present
-    task = getattr(app.state, "_reminder_task", None)
-    if task:
-        await task
+
+    tasks = [
+        task
+        for task in (getattr(app.state, name, None) for name in ("_leader_task", "_sender_task"))
+        if task is not None
+    ]
+    if not tasks:
+        return
+
+    # the sender needs the grace period plus a moment to release its claims
+    _, pending = await asyncio.wait(tasks, timeout=settings.shutdown_grace_seconds + 5)
+    for task in pending:
+        logger.warning(f"Worker task {task.get_name()} did not stop in time; cancelling it")
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
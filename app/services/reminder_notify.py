@@ -0,0 +1,116 @@
+"""PostgreSQL LISTEN/NOTIFY wake-ups for newly scheduled reminders.
+
+Code that creates reminders calls ``notify_reminders_scheduled`` inside its
+transaction; PostgreSQL delivers the NOTIFY on commit to every process
+listening on the channel, including this one. The listener hands the
+trigger time to the in-memory scheduler, so a reminder created one minute
+out fires on time even if it was written by another process.
+"""
+import asyncio
+import datetime
+from typing import Iterable, Optional
+
+import pytz
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+from sqlalchemy import text
+
+from app.constants.constants import settings
+from app.db import config_db
+from app.services.scheduler import as_utc, scheduler
+from app.utils.logging_utils import logger
+
+
+async def notify_reminders_scheduled(db, trigger_times: Iterable[Optional[datetime.datetime]]) -> None:
+    """Queue one NOTIFY carrying the earliest near-term trigger time.
+
+    Only the earliest time matters: the worker wakes then and its due-query
+    picks up everything else. Reminders beyond the lookahead window are left
+    to the scheduler's regular reload.
+    """
+    times = [as_utc(t) for t in trigger_times if t is not None]
+    if not times:
+        return
+
+    earliest = min(times)
+    horizon = datetime.datetime.now(pytz.UTC) + datetime.timedelta(seconds=settings.scheduler_lookahead_seconds)
+    if earliest > horizon:
+        return
+
+    await db.execute(
+        text("SELECT pg_notify(:channel, :payload)"),
+        {"channel": settings.reminder_notify_channel, "payload": earliest.isoformat()},
+    )
+
+
+def _handle_payload(payload: str) -> None:
+    try:
+        trigger_at = datetime.datetime.fromisoformat(payload)
+    except ValueError:
+        logger.warning(f"Ignoring malformed reminder notification: {payload!r}")
+        return
+    scheduler.schedule("notify", trigger_at)
+
+
+def _listen(conn) -> None:
+    with conn.cursor() as cur:
+        cur.execute(f'LISTEN "{settings.reminder_notify_channel}"')
+
+
+async def _listen_loop(stop_event: asyncio.Event) -> None:
+    """Hold a LISTEN connection, reconnecting if it drops."""
+    loop = asyncio.get_running_loop()
+
+    while not stop_event.is_set():
+        raw = None
+        lost = asyncio.Event()
+        try:
+            # a dedicated connection; it is invalidated rather than returned to the pool
+            raw = await config_db.run_db(config_db.engine.raw_connection)
+            conn = raw.driver_connection
+            conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+            await config_db.run_db(_listen, conn)
+
+            def _on_readable() -> None:
+                try:
+                    conn.poll()
+                except Exception as e:
+                    logger.warning(f"Reminder LISTEN connection lost: {e}")
+                    lost.set()
+                    return
+                while conn.notifies:
+                    _handle_payload(conn.notifies.pop(0).payload)
+
+            fd = conn.fileno()
+            loop.add_reader(fd, _on_readable)
+            # anything created while we were not listening is picked up by a reload
+            scheduler.force_reload()
+            logger.info(f"Listening for reminder notifications on {settings.reminder_notify_channel}")
+
+            waiters = [
+                asyncio.ensure_future(stop_event.wait()),
+                asyncio.ensure_future(lost.wait()),
+            ]
+            try:
+                await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                for waiter in waiters:
+                    waiter.cancel()
+                loop.remove_reader(fd)
+
+        except Exception as e:
+            logger.error(f"Reminder listener error: {e}")
+
+        finally:
+            if raw is not None:
+                raw.invalidate()
+
+        if not stop_event.is_set():
+            try:
+                await asyncio.wait_for(stop_event.wait(), timeout=settings.reminder_listen_retry_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+
+def start_listener(stop_event: asyncio.Event) -> asyncio.Task:
+    """Start the LISTEN background task. Call from inside the running event loop."""
+    return asyncio.create_task(_listen_loop(stop_event))
@@ -0,0 +1,115 @@
+"""In-process reminder scheduler.
+
+Keeps an in-memory min-heap of upcoming ``Reminders.next_trigger_at`` values so
+the worker can sleep until the earliest reminder is due instead of polling the
+database on a fixed interval.
+"""
+import asyncio
+import datetime
+import heapq
+from typing import Iterable, List, Optional, Tuple
+
+import pytz
+
+
+def as_utc(dt: datetime.datetime) -> datetime.datetime:
+    """Return ``dt`` as an aware UTC datetime (naive datetimes are assumed UTC)."""
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=pytz.UTC)
+    return dt.astimezone(pytz.UTC)
+
+
+class ReminderScheduler:
+    """Min-heap of (trigger_at, reminder_id) pairs with an async wake-up.
+
+    The heap only holds reminders inside the currently loaded lookahead window;
+    anything scheduled past the window is picked up on the next reload.
+    Entries can go stale (a reminder gets edited or deleted) - that is fine,
+    because the worker always re-checks the database before sending.
+    """
+
+    def __init__(self) -> None:
+        self._heap: List[Tuple[datetime.datetime, str]] = []
+        self._wakeup = asyncio.Event()
+        self._horizon: Optional[datetime.datetime] = None
+        self._loaded_at: Optional[datetime.datetime] = None
+
+    def load(
+        self,
+        entries: Iterable[Tuple[str, datetime.datetime]],
+        now: datetime.datetime,
+        horizon: datetime.datetime,
+    ) -> None:
+        """Replace the heap with ``(reminder_id, trigger_at)`` pairs loaded from the DB."""
+        self._heap = [(as_utc(trigger_at), reminder_id) for reminder_id, trigger_at in entries]
+        heapq.heapify(self._heap)
+        self._loaded_at = now
+        self._horizon = horizon
+
+    def needs_reload(self, now: datetime.datetime, max_age_seconds: int) -> bool:
+        """Whether the lookahead window has expired or is older than ``max_age_seconds``."""
+        if self._loaded_at is None or self._horizon is None:
+            return True
+        if now >= self._horizon:
+            return True
+        return (now - self._loaded_at).total_seconds() >= max_age_seconds
+
+    def force_reload(self) -> None:
+        """Make the worker re-read the lookahead window on its next iteration."""
+        self._loaded_at = None
+        self._wakeup.set()
+
+    def schedule(self, reminder_id: str, trigger_at: Optional[datetime.datetime]) -> None:
+        """Add a reminder to the heap, waking the worker if it is now the earliest."""
+        if trigger_at is None:
+            return
+        trigger_at = as_utc(trigger_at)
+
+        # outside the loaded window; the next reload will pick it up
+        if self._horizon is not None and trigger_at > self._horizon:
+            return
+
+        earliest = self.next_trigger_at()
+        heapq.heappush(self._heap, (trigger_at, reminder_id))
+        if earliest is None or trigger_at < earliest:
+            self._wakeup.set()
+
+    def next_trigger_at(self) -> Optional[datetime.datetime]:
+        """Earliest trigger time in the heap, or None if it is empty."""
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now: datetime.datetime) -> List[str]:
+        """Remove and return ids of all reminders due at or before ``now``."""
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            due.append(heapq.heappop(self._heap)[1])
+        return due
+
+    async def wait(
+        self, stop_event: asyncio.Event, max_sleep_seconds: float, lead_seconds: float = 0
+    ) -> None:
+        """Sleep until ``lead_seconds`` before the earliest reminder is due, a new
+        earlier one arrives, or stop is set."""
+        # clear before computing the timeout so a schedule() racing with us still wakes us up
+        self._wakeup.clear()
+
+        timeout = max_sleep_seconds
+        earliest = self.next_trigger_at()
+        if earliest is not None:
+            now = datetime.datetime.now(pytz.UTC)
+            timeout = min(timeout, max(0.0, (earliest - now).total_seconds() - lead_seconds))
+
+        waiters = [
+            asyncio.ensure_future(stop_event.wait()),
+            asyncio.ensure_future(self._wakeup.wait()),
+        ]
+        try:
+            await asyncio.wait(waiters, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for waiter in waiters:
+                waiter.cancel()
+
+
+# Shared scheduler for this process; fed by the worker's reloads and by
+# reminder notifications (see reminder_notify)
+scheduler = ReminderScheduler()
@@ -0,0 +1,157 @@
+"""Storage for in-progress bot conversations (/add, /notion, /settings).
+
+States are plain JSON-able dicts keyed by chat id. ``MemoryStateStore``
+keeps them in a per-process LRU; ``PostgresStateStore`` keeps them in
+``conversation_states`` so a half-finished flow survives restarts and any
+worker can continue it, optionally with a write-through cache for reads.
+Conversations untouched for ``conversation_state_ttl_seconds`` are dropped
+by both.
+
+Loading once per update and saving once afterwards is safe because a
+chat's updates are handled one at a time (see ``update_queue``). That
+ordering only holds within one process: with several workers, two updates
+for the same chat can be handled at once and the last save wins.
+"""
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+
+from sqlalchemy import delete, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import select
+
+from app.constants.constants import settings
+from app.db import config_db
+from app.db.models import ConversationStates
+from app.utils.logging_utils import logger
+from app.utils.ttl_cache import TTLCache
+
+State = Dict[str, Any]
+
+_MISSING = object()
+
+# expired rows are deleted at most this often per process
+PURGE_INTERVAL_SECONDS = 3600
+
+
+class StateStore(ABC):
+    """Interface of a conversation state store."""
+
+    @abstractmethod
+    async def load(self, chat_id: int) -> Optional[State]:
+        ...
+
+    @abstractmethod
+    async def save(self, chat_id: int, state: State) -> None:
+        ...
+
+    @abstractmethod
+    async def delete(self, chat_id: int) -> None:
+        ...
+
+
+class MemoryStateStore(StateStore):
+    """Per-process store; states are lost on restart and not shared."""
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self._states: TTLCache[State] = TTLCache(max_size=max_size, ttl_seconds=ttl_seconds)
+
+    async def load(self, chat_id: int) -> Optional[State]:
+        return self._states.get(chat_id)
+
+    async def save(self, chat_id: int, state: State) -> None:
+        self._states.set(chat_id, state)
+
+    async def delete(self, chat_id: int) -> None:
+        self._states.pop(chat_id)
+
+
+class PostgresStateStore(StateStore):
+    """States in ``conversation_states`` behind a write-through cache.
+
+    Writes go to the database first and then to the cache; reads are served
+    from the cache (including "no state") for ``cache_seconds``. The cache is
+    per process, so it can serve a stale state if another worker changed
+    the chat within that time; with ``cache_seconds`` 0 (the default) there
+    is no cache and every load reads the database.
+    """
+
+    def __init__(self, ttl_seconds: float, cache_size: int, cache_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._cache: Optional[TTLCache[Optional[State]]] = (
+            TTLCache(max_size=cache_size, ttl_seconds=cache_seconds) if cache_seconds > 0 else None
+        )
+        self._last_purge = float("-inf")
+
+    def _expired_before(self) -> datetime:
+        return datetime.now(timezone.utc) - timedelta(seconds=self.ttl_seconds)
+
+    async def load(self, chat_id: int) -> Optional[State]:
+        cached = self._cache.get(chat_id, _MISSING) if self._cache is not None else _MISSING
+        if cached is not _MISSING:
+            return cached
+
+        stmt = select(ConversationStates.state).where(
+            ConversationStates.chat_id == str(chat_id),
+            ConversationStates.updated_at >= self._expired_before(),
+        )
+        async with config_db.async_session() as db:
+            state = (await db.exec(stmt)).first()
+
+        self._cache_set(chat_id, state)
+        return state
+
+    async def save(self, chat_id: int, state: State) -> None:
+        stmt = insert(ConversationStates).values(chat_id=str(chat_id), state=state)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[ConversationStates.chat_id],
+            set_={"state": stmt.excluded.state, "updated_at": func.now()},
+        )
+        async with config_db.async_session() as db:
+            await db.exec(stmt)
+            await self._maybe_purge(db)
+            await db.commit()
+        self._cache_set(chat_id, state)
+
+    async def delete(self, chat_id: int) -> None:
+        stmt = delete(ConversationStates).where(ConversationStates.chat_id == str(chat_id))
+        async with config_db.async_session() as db:
+            await db.exec(stmt)
+            await db.commit()
+        self._cache_set(chat_id, None)
+
+    def _cache_set(self, chat_id: int, state: Optional[State]) -> None:
+        if self._cache is not None:
+            self._cache.set(chat_id, state)
+
+    async def _maybe_purge(self, db) -> None:
+        """Delete abandoned conversations, at most once per purge interval."""
+        now = time.monotonic()
+        if now - self._last_purge < PURGE_INTERVAL_SECONDS:
+            return
+        self._last_purge = now
+        result = await db.exec(
+            delete(ConversationStates).where(ConversationStates.updated_at < self._expired_before())
+        )
+        if result.rowcount:
+            logger.info(f"Dropped {result.rowcount} abandoned conversation state(s)")
+
+
+def _create_store() -> StateStore:
+    backend = settings.conversation_state_backend
+    if backend == "memory":
+        return MemoryStateStore(
+            max_size=settings.conversation_state_cache_size,
+            ttl_seconds=settings.conversation_state_ttl_seconds,
+        )
+    if backend == "postgres":
+        return PostgresStateStore(
+            ttl_seconds=settings.conversation_state_ttl_seconds,
+            cache_size=settings.conversation_state_cache_size,
+            cache_seconds=settings.conversation_state_cache_seconds,
+        )
+    raise ValueError(f"Unknown conversation_state_backend: {backend!r}")
+
+
+state_store = _create_store()
@@ -1,11 +1,149 @@
-import requests
-def send_message(bot_token: str, chat_id: str, message: str) -> None:
+"""Telegram Bot API client.
 
-    url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
+All sends share one ``httpx.AsyncClient`` so connections to api.telegram.org
+are kept alive between messages. ``main.lifespan`` opens it on startup and
+closes it on shutdown.
+
+Sends are throttled to Telegram's limits (about 30 messages/second per bot
+and 1/second per chat), and a 429 response pauses the chat for the
+``retry_after`` Telegram asks for before trying again.
+"""
+import asyncio
+import contextlib
+from typing import Optional
+
+import httpx
+
+from app.constants.constants import settings
+from app.utils.logging_utils import logger
+from app.utils.rate_limit import RateLimiter
+
+TELEGRAM_API_URL = "https://api.telegram.org"
+
+_client: Optional[httpx.AsyncClient] = None
+
+rate_limiter = RateLimiter(
+    global_rate=settings.telegram_global_rate,
+    global_burst=settings.telegram_global_rate,
+    key_rate=settings.telegram_chat_rate,
+    key_burst=settings.telegram_chat_burst,
+)
+
+
+def _get_client() -> httpx.AsyncClient:
+    """Return the shared client, creating it on first use."""
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            base_url=TELEGRAM_API_URL,
+            timeout=httpx.Timeout(settings.telegram_timeout_seconds),
+            limits=httpx.Limits(
+                max_connections=settings.telegram_max_connections,
+                max_keepalive_connections=settings.telegram_max_connections,
+            ),
+        )
+    return _client
+
+
+async def open_client() -> None:
+    """Create the shared client. Call from the app lifespan."""
+    _get_client()
+
+
+async def close_client() -> None:
+    """Close the shared client and its pooled connections."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def is_permanent_error(error: Exception) -> bool:
+    """Whether retrying a failed send can never succeed.
+
+    4xx answers (bad request, bot blocked, chat not found) are permanent;
+    network errors, 5xx and 429 are transient.
+    """
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        return 400 <= status < 500 and status != 429
+    return False
+
+
+def error_description(error: Exception) -> str:
+    """Telegram's description of a failed call (e.g. "Forbidden: bot was blocked by the user")."""
+    if isinstance(error, httpx.HTTPStatusError):
+        try:
+            return error.response.json().get("description") or str(error)
+        except Exception:
+            return str(error)
+    return str(error) or type(error).__name__
+
+
+# Telegram descriptions meaning the chat can no longer receive messages from us
+_UNREACHABLE_CHAT_ERRORS = (
+    "bot was blocked by the user",
+    "chat not found",
+    "user is deactivated",
+    "bot was kicked",
+)
+
+
+def is_chat_unreachable(error: Exception) -> bool:
+    """Whether a failed send means the chat blocked the bot or no longer exists."""
+    if not isinstance(error, httpx.HTTPStatusError):
+        return False
+    if error.response.status_code not in (400, 403):
+        return False
+    description = error_description(error).lower()
+    return any(reason in description for reason in _UNREACHABLE_CHAT_ERRORS)
+
+
+def error_class(error: Exception) -> str:
+    """Short, low-cardinality label for a failed send (for metrics)."""
+    if isinstance(error, httpx.HTTPStatusError):
+        if is_chat_unreachable(error):
+            return "chat_unreachable"
+        return f"http_{error.response.status_code}"
+    if isinstance(error, httpx.TimeoutException):
+        return "timeout"
+    if isinstance(error, httpx.TransportError):
+        return "network"
+    return type(error).__name__
+
+
+def _retry_after(response: httpx.Response) -> float:
+    """Seconds Telegram asked us to wait in a 429 response (1 if not given)."""
+    try:
+        return float(response.json()["parameters"]["retry_after"])
+    except Exception:
+        return 1.0
+
+
+async def send_message(
+    bot_token: str, chat_id: str, message: str, slot: Optional[asyncio.Semaphore] = None
+) -> None:
+    """Send a message, throttled to Telegram's limits.
+
+    ``slot`` bounds concurrent sends; it is only taken once the chat's rate
+    limit allows the message, so a throttled chat does not hold it.
+    """
     payload = {
         "chat_id": chat_id,
         "text": message
     }
 
-    response = requests.post(url, json=payload)
+    for attempt in range(settings.telegram_max_retries + 1):
+        await rate_limiter.acquire_key(str(chat_id))
+        async with slot or contextlib.nullcontext():
+            await rate_limiter.acquire_global()
+            response = await _get_client().post(f"/bot{bot_token}/sendMessage", json=payload)
+
+        if response.status_code != 429 or attempt == settings.telegram_max_retries:
+            break
+
+        retry_after = _retry_after(response)
+        logger.warning(f"Telegram rate limited chat {chat_id}; retrying in {retry_after}s")
+        rate_limiter.pause(str(chat_id), retry_after)
+
     response.raise_for_status()  # Raise an error for bad responses
@@ -0,0 +1,90 @@
+"""Drop Telegram updates that were already received.
+
+Telegram redelivers an update when the webhook answers slowly or fails, so
+the same ``/add`` step or Notion import could run twice. Updates are
+checked against an in-memory LRU of recent ``update_id`` values, and against
+the per-bot high-water mark persisted in ``telegram_update_offsets`` when
+this process started (which catches redeliveries across restarts). Both
+checks are O(1) and happen before any database work. A mark older than a
+week is ignored, because Telegram restarts update ids at random after a
+week without updates. An id is only
+recorded once its update was queued, so an update refused with a 503 is
+accepted when Telegram redelivers it, and the persisted mark is kept below
+updates this process refused until they come back.
+
+The mark is read at startup and the LRU is per process, so with several
+workers a redelivery that lands on a different worker than the original
+is not caught.
+"""
+from typing import Optional
+
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import select
+
+from app.constants.constants import settings
+from app.db import config_db
+from app.db.models import TelegramUpdateOffsets
+from app.utils.logging_utils import logger
+from app.utils.metrics import Counter
+from app.utils.dedupe import UpdateDeduplicator
+
+BOT_ID = settings.bot_token.split(":", 1)[0]
+
+_seen = UpdateDeduplicator(max_size=settings.update_dedupe_size, ttl_seconds=settings.update_dedupe_ttl_seconds)
+
+duplicate_updates_total = Counter(
+    "remindarr_webhook_duplicate_updates_total",
+    "Webhook updates dropped as redeliveries",
+)
+
+
+def is_duplicate(update_id: Optional[int]) -> bool:
+    """Whether the update was already received; see ``mark_received``."""
+    if update_id is None or not _seen.is_duplicate(update_id):
+        return False
+    duplicate_updates_total.inc()
+    return True
+
+
+def mark_received(update_id: Optional[int]) -> None:
+    """Remember an update once it was accepted for processing."""
+    if update_id is not None:
+        _seen.record(update_id)
+
+
+def mark_refused(update_id: Optional[int]) -> None:
+    """Remember an update that was refused; Telegram will redeliver it."""
+    if update_id is not None:
+        _seen.refuse(update_id)
+
+
+async def load_high_water_mark() -> None:
+    """Read the persisted high-water mark; call once on startup."""
+    stmt = select(TelegramUpdateOffsets.last_update_id, TelegramUpdateOffsets.updated_at).where(
+        TelegramUpdateOffsets.bot_id == BOT_ID
+    )
+    try:
+        async with config_db.async_session() as db:
+            row = (await db.exec(stmt)).first()
+        if row is not None:
+            _seen.set_high_water_mark(row.last_update_id, row.updated_at.timestamp())
+    except Exception as e:
+        logger.warning(f"Could not load the Telegram update high-water mark: {e}")
+
+
+async def record_processed(db, update_id: Optional[int]) -> None:
+    """Raise the persisted high-water mark to ``update_id`` (never lowers it),
+    or to just below the lowest refused update still awaiting redelivery."""
+    if update_id is None:
+        return
+    stmt = insert(TelegramUpdateOffsets).values(bot_id=BOT_ID, last_update_id=_seen.persistable_mark(update_id))
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[TelegramUpdateOffsets.bot_id],
+        set_={
+            "last_update_id": func.greatest(TelegramUpdateOffsets.last_update_id, stmt.excluded.last_update_id),
+            "updated_at": func.now(),
+        },
+    )
+    await db.exec(stmt)
+    await db.commit()
@@ -0,0 +1,91 @@
+"""Bounded in-process queue for Telegram webhook updates.
+
+The webhook endpoint only validates an update and enqueues it, so Telegram
+gets its 200 within milliseconds however long the handler takes (Notion
+imports, several replies). When the queue is full the endpoint answers 503
+and Telegram redelivers the update later.
+
+Updates are routed to a per-chat actor at enqueue time: each chat's
+updates are handled strictly in order, so its conversation state is never
+changed concurrently, while different chats run in parallel up to
+``webhook_consumers`` handlers at once.
+"""
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from app.constants.constants import settings
+from app.utils.actors import KeyedActors
+from app.utils.logging_utils import logger
+from app.utils.metrics import Counter, Gauge
+
+Update = Dict[str, Any]
+
+_actors: Optional[KeyedActors] = None
+
+updates_dropped_total = Counter(
+    "remindarr_webhook_updates_dropped_total",
+    "Webhook updates refused because the update queue was full",
+)
+update_queue_depth = Gauge(
+    "remindarr_webhook_queue_depth",
+    "Webhook updates waiting for or being processed by a chat actor",
+)
+chat_actors = Gauge(
+    "remindarr_webhook_chat_actors",
+    "Chats with a live actor",
+)
+
+
+def _chat_id(update: Update) -> Optional[int]:
+    return update.get("message", {}).get("chat", {}).get("id")
+
+
+def chat_is_idle(update: Update) -> bool:
+    """True if nothing from the update's chat is queued or being handled."""
+    return _actors is None or _actors.pending_for(_chat_id(update)) == 0
+
+
+def enqueue_update(update: Update) -> bool:
+    """Queue an update for its chat; False if the queue is full or not running."""
+    if _actors is None:
+        return False
+    if not _actors.submit(_chat_id(update), update):
+        updates_dropped_total.inc()
+        return False
+    return True
+
+
+def _log_failure(update: Update, error: Exception) -> None:
+    logger.error(f"Failed to process Telegram update {update.get('update_id')}: {error}", exc_info=error)
+
+
+def _update_gauges() -> None:
+    if _actors is not None:
+        update_queue_depth.set(_actors.pending)
+        chat_actors.set(len(_actors))
+
+
+def start_update_consumers(app, handle: Callable[[Update], Awaitable[None]]) -> None:
+    """Start routing updates to chat actors. Call from inside the running event loop."""
+    global _actors
+    _actors = KeyedActors(
+        handle,
+        max_pending=settings.webhook_queue_size,
+        concurrency=settings.webhook_consumers,
+        idle_seconds=settings.webhook_actor_idle_seconds,
+        on_error=_log_failure,
+        on_change=_update_gauges,
+    )
+
+
+async def stop_update_consumers(app) -> None:
+    """Stop accepting updates, finish queued ones within the shutdown grace period, then stop."""
+    global _actors
+    if _actors is None:
+        return
+    unhandled = await _actors.close(settings.shutdown_grace_seconds)
+    _actors = None
+    update_queue_depth.set(0)
+    chat_actors.set(0)
+    if unhandled:
+        # Telegram already got its 200 for these, so they are lost
+        logger.warning(f"Dropped {unhandled} unprocessed Telegram update(s) on shutdown")
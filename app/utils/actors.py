@@ -0,0 +1,129 @@
+"""Per-key actors: one mailbox and task per key, sharing a concurrency limit.
+
+Messages for the same key are handled strictly in order; different keys
+are handled concurrently, with at most ``concurrency`` handlers running at
+once. An actor exits after ``idle_seconds`` without messages, so memory is
+bounded by the keys that are actually active.
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[Any], Awaitable[None]]
+
+
+class _Actor:
+    def __init__(self, key: Hashable, owner: "KeyedActors"):
+        self.key = key
+        self.mailbox: asyncio.Queue = asyncio.Queue()
+        # messages queued or being handled
+        self.pending = 0
+        self._owner = owner
+        self.task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        owner = self._owner
+        while True:
+            try:
+                message = await asyncio.wait_for(self.mailbox.get(), timeout=owner.idle_seconds)
+            except asyncio.TimeoutError:
+                # nothing awaits between this check and the removal, so no
+                # message can slip into the mailbox of an exiting actor
+                if self.mailbox.empty():
+                    owner._evict(self)
+                    return
+                continue
+
+            try:
+                async with owner.semaphore:
+                    await owner.handle(message)
+            except Exception as e:
+                owner.on_error(message, e)
+            finally:
+                self.pending -= 1
+                owner._done()
+
+
+class KeyedActors:
+    """Bounded set of per-key mailboxes. Create inside the running event loop."""
+
+    def __init__(
+        self,
+        handle: Handler,
+        max_pending: int,
+        concurrency: int,
+        idle_seconds: float,
+        on_error: Optional[Callable[[Any, Exception], None]] = None,
+        on_change: Optional[Callable[[], None]] = None,
+    ):
+        self.handle = handle
+        self.max_pending = max_pending
+        self.idle_seconds = idle_seconds
+        self.semaphore = asyncio.Semaphore(max(1, concurrency))
+        self.on_error = on_error or (lambda message, e: logger.exception("Actor handler failed"))
+        self._on_change = on_change or (lambda: None)
+        self.accepting = True
+        self._actors: Dict[Hashable, _Actor] = {}
+        self._pending = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    @property
+    def pending(self) -> int:
+        """Messages queued or being handled."""
+        return self._pending
+
+    def pending_for(self, key: Hashable) -> int:
+        """Messages for ``key`` queued or being handled."""
+        actor = self._actors.get(key)
+        return actor.pending if actor is not None else 0
+
+    def __len__(self) -> int:
+        return len(self._actors)
+
+    def submit(self, key: Hashable, message: Any) -> bool:
+        """Put a message in its key's mailbox; False if full or closed."""
+        if not self.accepting or self._pending >= self.max_pending:
+            return False
+
+        actor = self._actors.get(key)
+        if actor is None:
+            actor = self._actors[key] = _Actor(key, self)
+
+        actor.mailbox.put_nowait(message)
+        actor.pending += 1
+        self._pending += 1
+        self._idle.clear()
+        self._on_change()
+        return True
+
+    def _done(self) -> None:
+        self._pending -= 1
+        if self._pending == 0:
+            self._idle.set()
+        self._on_change()
+
+    def _evict(self, actor: _Actor) -> None:
+        if self._actors.get(actor.key) is actor:
+            del self._actors[actor.key]
+            self._on_change()
+
+    async def close(self, grace_seconds: float) -> int:
+        """Stop accepting, let queued messages finish within ``grace_seconds``,
+        then stop the actors. Returns how many messages were left unhandled."""
+        self.accepting = False
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout=grace_seconds)
+        except asyncio.TimeoutError:
+            pass
+        unhandled = self._pending
+
+        tasks = [actor.task for actor in self._actors.values()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._actors.clear()
+        self._on_change()
+        return unhandled
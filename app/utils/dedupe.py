@@ -0,0 +1,72 @@
+"""Recognise redelivered Telegram updates by ``update_id``."""
+import time
+from typing import Callable, Dict, Optional
+
+from app.utils.ttl_cache import TTLCache
+
+# Telegram numbers updates sequentially, but picks the next update_id at
+# random once there have been no updates for a week
+UPDATE_ID_RESET_SECONDS = 7 * 24 * 3600
+
+
+class UpdateDeduplicator:
+    """Recent ``update_id`` values plus an optional high-water mark.
+
+    ``is_duplicate`` only checks; call ``record`` once the update was
+    accepted, so an update refused for now is not a duplicate when Telegram
+    redelivers it. The high-water mark is ignored once it is older than
+    ``UPDATE_ID_RESET_SECONDS``, since ids after a reset can be lower.
+
+    Refused updates (``refuse``) are remembered for ``ttl_seconds``, and
+    ``persistable_mark`` keeps the mark written for the next start below
+    them, so their redelivery is not taken for a duplicate after a restart.
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        ttl_seconds: float,
+        clock: Callable[[], float] = time.monotonic,
+        wall_clock: Callable[[], float] = time.time,
+    ):
+        self._recent: TTLCache[bool] = TTLCache(max_size=max_size, ttl_seconds=ttl_seconds, clock=clock)
+        self._clock = clock
+        self._wall_clock = wall_clock
+        self.ttl_seconds = ttl_seconds
+        # refused update_id -> when it was refused
+        self._refused: Dict[int, float] = {}
+        self._high_water_mark: Optional[int] = None
+        self._high_water_mark_at = 0.0
+
+    def set_high_water_mark(self, update_id: int, recorded_at: float) -> None:
+        """Treat ids up to ``update_id`` as seen; ``recorded_at`` is a Unix time."""
+        self._high_water_mark = update_id
+        self._high_water_mark_at = recorded_at
+
+    def is_duplicate(self, update_id: int) -> bool:
+        if update_id in self._recent:
+            return True
+        return (
+            self._high_water_mark is not None
+            and update_id <= self._high_water_mark
+            and self._wall_clock() - self._high_water_mark_at < UPDATE_ID_RESET_SECONDS
+        )
+
+    def record(self, update_id: int) -> None:
+        self._recent.set(update_id, True)
+        self._refused.pop(update_id, None)
+
+    def refuse(self, update_id: int) -> None:
+        """Note an update that was turned away and will be redelivered."""
+        self._refused.setdefault(update_id, self._clock())
+
+    def persistable_mark(self, update_id: int) -> int:
+        """The high-water mark to persist after processing ``update_id``."""
+        now = self._clock()
+        for refused_id, refused_at in list(self._refused.items()):
+            # Telegram has long stopped redelivering it
+            if now - refused_at >= self.ttl_seconds:
+                del self._refused[refused_id]
+        if not self._refused:
+            return update_id
+        return min(update_id, min(self._refused) - 1)
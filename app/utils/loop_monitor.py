@@ -0,0 +1,54 @@
+"""Event-loop stall monitor.
+
+A small task sleeps for a fixed interval and measures how late it wakes up.
+Any lateness is time the loop spent running something else without
+yielding - i.e. blocking every webhook and background task.
+"""
+import asyncio
+import time
+
+from app.utils.logging_utils import logger
+from app.utils.metrics import Gauge, Histogram
+
+CHECK_INTERVAL_SECONDS = 0.1
+WARN_STALL_SECONDS = 0.25
+
+loop_stall_seconds = Histogram(
+    "remindarr_event_loop_stall_seconds",
+    "How late the event loop woke a sleeping task (time spent blocked)",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+loop_max_stall_seconds = Gauge(
+    "remindarr_event_loop_max_stall_seconds",
+    "Longest event loop stall seen since startup",
+)
+
+_max_stall = 0.0
+
+
+async def _monitor_loop(stop_event: asyncio.Event) -> None:
+    global _max_stall
+    while not stop_event.is_set():
+        started = time.monotonic()
+        await asyncio.sleep(CHECK_INTERVAL_SECONDS)
+        stall = max(0.0, time.monotonic() - started - CHECK_INTERVAL_SECONDS)
+
+        loop_stall_seconds.observe(stall)
+        if stall > _max_stall:
+            _max_stall = stall
+            loop_max_stall_seconds.set(stall)
+        if stall >= WARN_STALL_SECONDS:
+            logger.warning(f"Event loop was blocked for {stall:.3f}s")
+
+
+def start_loop_monitor(app) -> None:
+    """Start the stall monitor task. Call from inside the running event loop."""
+    app.state._loop_monitor_stop = asyncio.Event()
+    app.state._loop_monitor_task = asyncio.create_task(_monitor_loop(app.state._loop_monitor_stop))
+
+
+async def stop_loop_monitor(app) -> None:
+    if not hasattr(app.state, "_loop_monitor_stop"):
+        return
+    app.state._loop_monitor_stop.set()
+    await app.state._loop_monitor_task
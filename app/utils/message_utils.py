@@ -0,0 +1,91 @@
+"""Helpers for building Telegram message text."""
+from typing import List, Sequence, Tuple
+
+# Telegram rejects sendMessage texts longer than this
+TELEGRAM_MAX_MESSAGE_LENGTH = 4096
+
+
+def split_message(text: str, limit: int = TELEGRAM_MAX_MESSAGE_LENGTH) -> List[str]:
+    """Split ``text`` into parts of at most ``limit`` characters.
+
+    Splits prefer paragraph breaks, then line breaks, then spaces, and only
+    cut mid-word when a single word is longer than ``limit``.
+    """
+    parts = []
+    while len(text) > limit:
+        cut = -1
+        for separator in ("\n\n", "\n", " "):
+            cut = text.rfind(separator, 0, limit + 1)
+            if cut > 0:
+                break
+        if cut <= 0:
+            cut = limit
+
+        parts.append(text[:cut].rstrip())
+        text = text[cut:].lstrip()
+
+    if text:
+        parts.append(text)
+    return parts
+
+
+def digest_units(
+    messages: Sequence[str], limit: int = TELEGRAM_MAX_MESSAGE_LENGTH
+) -> List[Tuple[List[int], List[str]]]:
+    """Merge reminder messages into as few Telegram messages as fit ``limit``.
+
+    Returns (indexes of the messages, parts) units in order. A unit is a
+    single part unless a message too long for one part had to be split, in
+    which case every part holding a piece of it is in the same unit; a unit
+    can be sent and retried without resending any other unit.
+
+    Messages are never split across parts unless one is too long by itself.
+    """
+    if len(messages) == 1:
+        return [([0], split_message(messages[0], limit))]
+
+    # the header goes at the top of the first part
+    header = f"📋 {len(messages)} reminders\n\n"
+    parts: List[Tuple[List[int], str]] = []
+    current, current_ids = "", []
+
+    def capacity() -> int:
+        return limit if parts else limit - len(header)
+
+    for index, message in enumerate(messages):
+        candidate = f"{current}\n\n{message}" if current else message
+        if len(candidate) <= capacity():
+            current, current_ids = candidate, current_ids + [index]
+            continue
+
+        if current:
+            parts.append((current_ids, current))
+        if len(message) > capacity():
+            *whole, current = split_message(message, capacity())
+            parts.extend(([index], piece) for piece in whole)
+        else:
+            current = message
+        current_ids = [index]
+
+    if current:
+        parts.append((current_ids, current))
+    if not parts:
+        return []
+
+    ids, first = parts[0]
+    parts[0] = (ids, header + first)
+
+    units: List[Tuple[List[int], List[str]]] = []
+    for ids, part in parts:
+        # the previous part ends with a piece of the same message
+        if units and units[-1][0][-1] == ids[0]:
+            units[-1][0].extend(ids[1:])
+            units[-1][1].append(part)
+        else:
+            units.append((list(ids), [part]))
+    return units
+
+
+def build_digest(messages: Sequence[str], limit: int = TELEGRAM_MAX_MESSAGE_LENGTH) -> List[str]:
+    """The parts of ``digest_units`` as one list of message texts."""
+    return [part for _, unit_parts in digest_units(messages, limit) for part in unit_parts]
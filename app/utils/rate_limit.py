@@ -0,0 +1,119 @@
+"""Token-bucket rate limiting for outgoing API calls.
+
+Buckets hand out reservations instead of blocking: each call takes a token
+right away (the balance may go negative) and is told how long to wait for it.
+Callers therefore queue up in FIFO order without a lock, which is safe
+because everything runs on one event loop.
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Callable, Hashable
+
+
+class TokenBucket:
+    """Allows ``rate`` calls per second with bursts of up to ``capacity``."""
+
+    def __init__(self, rate: float, capacity: float, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._tokens = capacity
+        self._updated = clock()
+        self._paused_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        # no tokens accrue while paused by a server-side back-off
+        start = max(self._updated, self._paused_until)
+        if now > start:
+            self._tokens = min(self.capacity, self._tokens + (now - start) * self.rate)
+        self._updated = max(self._updated, now)
+
+    def reserve(self) -> float:
+        """Take one token and return how many seconds to wait before using it."""
+        now = self._clock()
+        self._refill(now)
+        self._tokens -= 1
+        # tokens only start accruing again once any pause is over
+        start = max(now, self._paused_until)
+        deficit = max(0.0, -self._tokens)
+        return start - now + deficit / self.rate
+
+    def pause(self, seconds: float) -> None:
+        """Hand out no tokens for ``seconds`` (e.g. a 429 ``retry_after``)."""
+        now = self._clock()
+        self._refill(now)
+        self._paused_until = max(self._paused_until, now + seconds)
+
+    def is_idle(self) -> bool:
+        """Whether the bucket is full and unpaused, i.e. indistinguishable from a new one."""
+        now = self._clock()
+        self._refill(now)
+        return self._tokens >= self.capacity and now >= self._paused_until
+
+    async def acquire(self) -> None:
+        delay = self.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class RateLimiter:
+    """One global bucket plus one bucket per key (chat id).
+
+    Idle per-key buckets are dropped once more than ``max_keys`` exist, so
+    memory stays bounded no matter how many chats the bot talks to.
+    """
+
+    def __init__(
+        self,
+        global_rate: float,
+        global_burst: float,
+        key_rate: float,
+        key_burst: float,
+        max_keys: int = 10000,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._clock = clock
+        self._global = TokenBucket(global_rate, global_burst, clock)
+        self._key_rate = key_rate
+        self._key_burst = key_burst
+        self._max_keys = max_keys
+        self._buckets: "OrderedDict[Hashable, TokenBucket]" = OrderedDict()
+
+    def _bucket(self, key: Hashable) -> TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(self._key_rate, self._key_burst, self._clock)
+            self._buckets[key] = bucket
+            self._evict_idle()
+        else:
+            self._buckets.move_to_end(key)
+        return bucket
+
+    def _evict_idle(self) -> None:
+        if len(self._buckets) <= self._max_keys:
+            return
+        for key in list(self._buckets):
+            if len(self._buckets) <= self._max_keys:
+                break
+            if self._buckets[key].is_idle():
+                del self._buckets[key]
+
+    async def acquire(self, key: Hashable) -> None:
+        """Wait for the key's bucket, then the global one.
+
+        The per-key wait comes first so a chat that is throttled anyway does
+        not hold global slots other chats could use.
+        """
+        await self.acquire_key(key)
+        await self.acquire_global()
+
+    async def acquire_key(self, key: Hashable) -> None:
+        """Wait for the key's bucket only; follow with ``acquire_global``."""
+        await self._bucket(key).acquire()
+
+    async def acquire_global(self) -> None:
+        await self._global.acquire()
+
+    def pause(self, key: Hashable, seconds: float) -> None:
+        self._bucket(key).pause(seconds)
@@ -0,0 +1,19 @@
+"""Retry helpers."""
+import random
+from typing import Callable
+
+
+def backoff_delay(
+    attempt: int,
+    base_seconds: float,
+    max_seconds: float,
+    rand: Callable[[], float] = random.random,
+) -> float:
+    """Exponential backoff with jitter for the given (1-based) attempt number.
+
+    The delay doubles each attempt up to ``max_seconds``; the second half of
+    it is randomised so retries from a burst of failures spread out instead
+    of all coming back at once.
+    """
+    delay = min(max_seconds, base_seconds * (2 ** max(0, attempt - 1)))
+    return delay / 2 + rand() * delay / 2
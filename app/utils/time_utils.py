@@ -3,7 +3,7 @@
 This module combines time parsing and timezone helpers used across the app.
 """
 from datetime import datetime, timedelta, timezone
-from typing import Tuple, Optional
+from typing import List, Tuple, Optional
 
 try:
     # Preferred: use stdlib zoneinfo
@@ -95,4 +95,73 @@ def calculate_next_trigger(
     next_trigger_at = utc_now + timedelta(minutes=total_minutes)
 
     interval_minutes = total_minutes if is_recurring else None
-    return interval_minutes, next_trigger_at
\ No newline at end of file
+    return interval_minutes, next_trigger_at
+
+# Catch-up policies for recurring reminders that were missed (e.g. downtime)
+CATCH_UP_FIRE_ONCE = "fire_once"  # send one message for the latest missed occurrence
+CATCH_UP_FIRE_ALL = "fire_all"  # send every missed occurrence, up to a cap
+CATCH_UP_SKIP = "skip"  # drop missed occurrences and wait for the next one
+CATCH_UP_POLICIES = (CATCH_UP_FIRE_ONCE, CATCH_UP_FIRE_ALL, CATCH_UP_SKIP)
+
+
+def _assume_utc(dt: datetime) -> datetime:
+    """Treat naive datetimes as UTC."""
+    return dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt
+
+
+def next_occurrence(
+    anchor: datetime, interval_minutes: int, now: datetime
+) -> Tuple[datetime, int]:
+    """Find the first occurrence of a recurring schedule after ``now``.
+
+    Occurrences are ``anchor + k * interval``, so the series never drifts
+    with processing delays. Computed arithmetically rather than by stepping.
+
+    Returns (next_occurrence, missed) where ``missed`` counts occurrences
+    after ``anchor`` that are already at or before ``now``.
+    """
+    if interval_minutes <= 0:
+        raise ValueError("Interval must be positive")
+
+    anchor = _assume_utc(anchor)
+    now = _assume_utc(now)
+
+    if now < anchor:
+        return anchor, 0
+
+    interval = timedelta(minutes=interval_minutes)
+    missed = (now - anchor) // interval
+    return anchor + (missed + 1) * interval, missed
+
+
+def catch_up_occurrences(
+    anchor: datetime,
+    interval_minutes: int,
+    now: datetime,
+    policy: Optional[str],
+    max_occurrences: int,
+) -> Tuple[List[datetime], datetime]:
+    """Decide which occurrences of a due recurring reminder to send now.
+
+    ``anchor`` is the reminder's due ``next_trigger_at``. Returns
+    (occurrences_to_send, next_trigger_at). Unknown policies behave like
+    ``fire_once``.
+    """
+    next_at, missed = next_occurrence(anchor, interval_minutes, now)
+    interval = timedelta(minutes=interval_minutes)
+    latest = next_at - interval
+
+    # not due yet
+    if latest < _assume_utc(anchor):
+        return [], next_at
+
+    if policy == CATCH_UP_SKIP:
+        # only send if we are still within the occurrence's own interval
+        return ([] if missed else [latest]), next_at
+
+    if policy == CATCH_UP_FIRE_ALL:
+        # the most recent ones when capped
+        count = min(missed + 1, max(1, max_occurrences))
+        return [latest - (count - 1 - i) * interval for i in range(count)], next_at
+
+    return [latest], next_at
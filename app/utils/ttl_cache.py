@@ -0,0 +1,65 @@
+"""Bounded LRU cache whose entries also expire after a fixed time."""
+import time
+from collections import OrderedDict
+from typing import Callable, Generic, Hashable, Optional, Tuple, TypeVar
+
+V = TypeVar("V")
+
+_MISSING = object()
+
+
+class TTLCache(Generic[V]):
+    """At most ``max_size`` entries, each valid for ``ttl_seconds`` after it was set.
+
+    Reads refresh an entry's LRU position but not its expiry; when full, the
+    least recently used entry is evicted. All operations are O(1) apart
+    from dropping entries that have already expired.
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        ttl_seconds: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_size = max(1, max_size)
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, Tuple[float, V]]" = OrderedDict()
+
+    def get(self, key: Hashable, default: Optional[V] = None) -> Optional[V]:
+        entry = self._entries.get(key, _MISSING)
+        if entry is _MISSING:
+            return default
+        expires_at, value = entry
+        if expires_at <= self._clock():
+            del self._entries[key]
+            return default
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: V) -> None:
+        self._entries[key] = (self._clock() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        self._evict()
+
+    def pop(self, key: Hashable, default: Optional[V] = None) -> Optional[V]:
+        entry = self._entries.pop(key, _MISSING)
+        if entry is _MISSING or entry[0] <= self._clock():
+            return default
+        return entry[1]
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _evict(self) -> None:
+        now = self._clock()
+        while self._entries:
+            key, (expires_at, _) = next(iter(self._entries.items()))
+            if len(self._entries) > self.max_size or expires_at <= now:
+                del self._entries[key]
+            else:
+                break
@@ -0,0 +1,9 @@
+"""Manually advanced clock shared by the tests."""
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
@@ -2,12 +2,21 @@ from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 
 app = FastAPI()
 
 import app.db.config_db as config_db
-from app.router.notification_router import router as notification_router
+from app.router.notification_router import process_update, router as notification_router
+from app.services import telegram
+from app.services import leader
+from app.services.delivery_sender import WORKER_ID, refresh_queue_depth
 from app.services.notification_worker import start_worker, stop_worker
+from app.services.update_dedupe import load_high_water_mark
+from app.services.update_queue import start_update_consumers, stop_update_consumers
+from app.utils.logging_utils import logger
+from app.utils.loop_monitor import start_loop_monitor, stop_loop_monitor
+from app.utils.metrics import render_metrics
 
 
 @asynccontextmanager
@@ -15,6 +24,17 @@ async def lifespan(app: FastAPI):
     # initialize DB
     config_db.init_db()
 
+    # open the shared Telegram HTTP client before anything sends messages
+    await telegram.open_client()
+
+    # measure how long the event loop gets blocked
+    start_loop_monitor(app)
+
+    # consumers for webhook updates; the endpoint only queues them after
+    # dropping redeliveries, including ones from before this start
+    await load_high_water_mark()
+    start_update_consumers(app, process_update)
+
     # start background reminder worker
     # start_worker creates an asyncio.Task; it must be called inside the running event loop
     start_worker(app)
@@ -22,9 +42,15 @@ async def lifespan(app: FastAPI):
     try:
         yield
     finally:
-        # stop worker gracefully then dispose DB engine
+        # finish queued updates and stop the worker gracefully, then close the
+        # Telegram client and DB engine
+        await stop_update_consumers(app)
         await stop_worker(app)
-        await config_db.engine.dispose()
+        await stop_loop_monitor(app)
+        await telegram.close_client()
+        config_db.db_executor.shutdown(wait=True)
+        await config_db.async_engine.dispose()
+        config_db.engine.dispose()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -38,10 +64,30 @@ app.add_middleware(CORSMiddleware,
 app.include_router(notification_router, prefix="/api")
 
 
-# basic healthcheck
+# basic healthcheck, plus which instance runs the scheduler
 @app.get("/health")
 async def health_check():
-    return {"status": "ok"}
+    try:
+        leader_instance = await leader.current_leader()
+    except Exception as e:
+        logger.warning(f"Could not read scheduler leader: {e}")
+        leader_instance = None
+    return {
+        "status": "ok",
+        "instance": WORKER_ID,
+        "is_leader": leader.is_leader(),
+        "leader": leader_instance,
+    }
+
+
+# Prometheus scrape endpoint
+@app.get("/metrics")
+async def metrics():
+    try:
+        await refresh_queue_depth()
+    except Exception as e:
+        logger.warning(f"Could not read outbox depth for metrics: {e}")
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
 
 
 @app.get("/auth_check")
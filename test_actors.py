@@ -0,0 +1,75 @@
+import asyncio
+from app.utils.actors import KeyedActors
+
+def test_per_key_order_and_cross_key_concurrency():
+    async def run():
+        handled = []
+        in_flight = 0
+        peak = 0
+
+        async def handle(message):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.001)
+            handled.append(message)
+            in_flight -= 1
+
+        actors = KeyedActors(handle, max_pending=100, concurrency=2, idle_seconds=1)
+        for n in range(4):
+            for chat in ("a", "b", "c"):
+                assert actors.submit(chat, (chat, n))
+        await actors.close(grace_seconds=1)
+        return handled, peak
+
+    handled, peak = asyncio.run(run())
+    assert peak == 2, "Chats run concurrently up to the limit"
+    for chat in ("a", "b", "c"):
+        assert [n for c, n in handled if c == chat] == [0, 1, 2, 3], "Per-chat order must be kept"
+
+def test_queue_is_bounded():
+    async def run():
+        async def handle(message):
+            await asyncio.sleep(0.01)
+
+        actors = KeyedActors(handle, max_pending=2, concurrency=1, idle_seconds=1)
+        accepted = [actors.submit("a", n) for n in range(3)]
+        await actors.close(grace_seconds=1)
+        return accepted, actors.submit("a", 4)
+
+    accepted, after_close = asyncio.run(run())
+    assert accepted == [True, True, False], "Third message exceeds max_pending"
+    assert after_close is False, "Closed actors accept nothing"
+
+def test_idle_actors_are_evicted():
+    async def run():
+        async def handle(message):
+            pass
+
+        actors = KeyedActors(handle, max_pending=10, concurrency=1, idle_seconds=0.01)
+        actors.submit("a", 1)
+        assert len(actors) == 1
+        await asyncio.sleep(0.05)
+        return len(actors)
+
+    assert asyncio.run(run()) == 0, "Actor should exit after the idle timeout"
+
+def test_pending_is_counted_per_key():
+    async def run():
+        release = asyncio.Event()
+
+        async def handle(message):
+            await release.wait()
+
+        actors = KeyedActors(handle, max_pending=10, concurrency=1, idle_seconds=1)
+        actors.submit("a", 1)
+        actors.submit("a", 2)
+        await asyncio.sleep(0)
+        counts = (actors.pending_for("a"), actors.pending_for("b"))
+        release.set()
+        await actors.close(grace_seconds=1)
+        return counts, actors.pending_for("a")
+
+    counts, after = asyncio.run(run())
+    assert counts == (2, 0), "The message being handled still counts for its key"
+    assert after == 0
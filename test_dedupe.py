@@ -0,0 +1,40 @@
+from app.utils.dedupe import UPDATE_ID_RESET_SECONDS, UpdateDeduplicator
+from fake_clock import FakeClock
+
+def test_refused_update_is_accepted_when_redelivered():
+    seen = UpdateDeduplicator(max_size=10, ttl_seconds=60, clock=FakeClock())
+    assert seen.is_duplicate(7) is False
+    # queue full: answered 503 without recording the update
+    assert seen.is_duplicate(7) is False, "Telegram's redelivery must be processed"
+    seen.record(7)
+    assert seen.is_duplicate(7) is True, "A second redelivery after acceptance is a duplicate"
+
+def test_high_water_mark_drops_older_ids():
+    wall = FakeClock()
+    seen = UpdateDeduplicator(max_size=10, ttl_seconds=60, clock=FakeClock(), wall_clock=wall)
+    seen.set_high_water_mark(500, recorded_at=wall.now)
+    assert seen.is_duplicate(500) is True
+    assert seen.is_duplicate(501) is False
+
+def test_stale_high_water_mark_is_ignored():
+    wall = FakeClock()
+    seen = UpdateDeduplicator(max_size=10, ttl_seconds=60, clock=FakeClock(), wall_clock=wall)
+    seen.set_high_water_mark(500, recorded_at=wall.now)
+    wall.now += UPDATE_ID_RESET_SECONDS
+    assert seen.is_duplicate(42) is False, "Telegram may have restarted ids at random after a quiet week"
+
+def test_persisted_mark_stays_below_refused_updates():
+    clock = FakeClock()
+    seen = UpdateDeduplicator(max_size=10, ttl_seconds=60, clock=clock)
+    seen.refuse(101)
+    seen.record(102)
+    assert seen.persistable_mark(102) == 100, "101 must survive a restart until it is redelivered"
+    seen.record(101)
+    assert seen.persistable_mark(102) == 102
+
+def test_refused_updates_are_forgotten_after_ttl():
+    clock = FakeClock()
+    seen = UpdateDeduplicator(max_size=10, ttl_seconds=60, clock=clock)
+    seen.refuse(101)
+    clock.now += 60
+    assert seen.persistable_mark(102) == 102, "A redelivery that went elsewhere must not pin the mark"
@@ -0,0 +1,95 @@
+import asyncio
+from app.services.dispatcher import NotSent, dispatch
+
+def test_per_chat_order_and_concurrency_limit():
+    # Three chats, several messages each; at most 2 sends in flight
+    items = [(chat, n) for n in range(4) for chat in ("a", "b", "c")]
+    sent = []
+    in_flight = 0
+    peak = 0
+
+    async def send(item):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.001)
+        sent.append(item)
+        in_flight -= 1
+
+    results = asyncio.run(dispatch(items, key=lambda i: i[0], send=send, concurrency=2))
+
+    assert peak == 2, "Should use but not exceed the concurrency limit"
+    for chat in ("a", "b", "c"):
+        assert [n for c, n in sent if c == chat] == [0, 1, 2, 3], "Per-chat order must be kept"
+    assert [item for item, _ in results] == items, "Results should follow input order"
+
+def test_failures_are_reported_per_item():
+    async def send(item):
+        if item == ("a", 1):
+            raise RuntimeError("boom")
+
+    items = [("a", 0), ("a", 1), ("a", 2)]
+    results = asyncio.run(dispatch(items, key=lambda i: i[0], send=send, concurrency=4))
+
+    errors = [error for _, error in results]
+    assert errors[0] is None and errors[2] is None, "Later messages still go out"
+    assert isinstance(errors[1], RuntimeError), "The failing send carries its error"
+
+def test_stop_skips_new_sends_and_bounds_in_flight_ones():
+    async def run():
+        stop = asyncio.Event()
+        started = []
+
+        async def send(item):
+            started.append(item)
+            if item == ("a", 0):
+                stop.set()
+                await asyncio.sleep(0.01)
+            else:
+                await asyncio.sleep(10)
+
+        items = [("a", 0), ("a", 1), ("b", 0)]
+        return started, await dispatch(
+            items, key=lambda i: i[0], send=send, concurrency=1, stop_event=stop, grace_seconds=0.05
+        )
+
+    started, results = asyncio.run(run())
+    errors = dict(results)
+    assert errors[("a", 0)] is None, "The send in flight finishes within the grace period"
+    assert isinstance(errors[("a", 1)], NotSent) and not errors[("a", 1)].started, "Nothing new starts"
+    assert isinstance(errors[("b", 0)], NotSent), "Waiting chats are skipped too"
+    assert ("a", 1) not in started
+
+def test_sends_past_the_grace_period_are_interrupted():
+    async def run():
+        stop = asyncio.Event()
+
+        async def send(item):
+            await asyncio.sleep(10)
+
+        async def stop_soon():
+            await asyncio.sleep(0.01)
+            stop.set()
+
+        asyncio.ensure_future(stop_soon())
+        return await dispatch(
+            [("a", 0)], key=lambda i: i[0], send=send, concurrency=1, stop_event=stop, grace_seconds=0.01
+        )
+
+    [(_, error)] = asyncio.run(run())
+    assert isinstance(error, NotSent) and error.started, "A cancelled send may have gone out"
+
+def test_no_concurrency_limit_leaves_limiting_to_send():
+    items = [(chat, 0) for chat in "abcde"]
+    in_flight = 0
+    peak = 0
+
+    async def send(item):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.001)
+        in_flight -= 1
+
+    asyncio.run(dispatch(items, key=lambda i: i[0], send=send, concurrency=None))
+    assert peak == 5, "Every chat's chain should start at once"
@@ -0,0 +1,34 @@
+from app.utils.message_utils import build_digest, digest_units, split_message
+
+def test_split_message_keeps_short_text_whole():
+    assert split_message("hello") == ["hello"]
+
+def test_split_message_prefers_paragraph_breaks():
+    text = "a" * 6 + "\n\n" + "b" * 6
+    assert split_message(text, limit=10) == ["a" * 6, "b" * 6], "Should split at the blank line"
+
+def test_split_message_cuts_long_words():
+    parts = split_message("x" * 25, limit=10)
+    assert parts == ["x" * 10, "x" * 10, "x" * 5]
+    assert all(len(p) <= 10 for p in parts)
+
+def test_build_digest_merges_messages():
+    parts = build_digest(["one", "two"])
+    assert parts == ["📋 2 reminders\n\none\n\ntwo"]
+
+def test_build_digest_respects_limit_without_splitting_messages():
+    messages = ["m" * 30, "n" * 30, "o" * 30]
+    parts = build_digest(messages, limit=70)
+    assert all(len(p) <= 70 for p in parts)
+    assert parts == ["📋 3 reminders\n\n" + "m" * 30, "n" * 30 + "\n\n" + "o" * 30], "Messages are never cut"
+
+def test_build_digest_puts_header_on_first_part():
+    parts = build_digest(["x" * 4090, "y" * 10])
+    assert len(parts) == 2, "The header should not be sent on its own"
+    assert parts[0].startswith("📋 2 reminders\n\n")
+    assert all(len(p) <= 4096 for p in parts)
+
+def test_digest_units_keep_split_message_together():
+    units = digest_units(["a" * 5, "b" * 25, "c" * 5], limit=20)
+    assert [ids for ids, _ in units] == [[0], [1, 2]], "Parts of b belong to one unit"
+    assert all(len(p) <= 20 for _, parts in units for p in parts)
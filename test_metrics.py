@@ -0,0 +1,34 @@
+from app.utils.metrics import Counter, Gauge, Histogram, render_metrics
+
+def test_counter_renders_help_type_and_labelled_samples():
+    counter = Counter("test_sends_total", "Sends by outcome", ["outcome"])
+    counter.inc(outcome="sent")
+    counter.inc(2, outcome="sent")
+    assert counter.render() == [
+        "# HELP test_sends_total Sends by outcome",
+        "# TYPE test_sends_total counter",
+        'test_sends_total{outcome="sent"} 3',
+    ]
+
+def test_label_values_are_escaped():
+    gauge = Gauge("test_escaped", "Escaping", ["error"])
+    gauge.set(1.5, error='bad "quote"\\path\nline')
+    assert gauge.render()[-1] == 'test_escaped{error="bad \\"quote\\"\\\\path\\nline"} 1.5'
+
+def test_histogram_buckets_are_cumulative_with_inf():
+    histogram = Histogram("test_latency_seconds", "Latency", buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.7, 30):
+        histogram.observe(value)
+    assert histogram.render()[2:] == [
+        'test_latency_seconds_bucket{le="0.1"} 1',
+        'test_latency_seconds_bucket{le="1"} 3',
+        'test_latency_seconds_bucket{le="+Inf"} 4',
+        "test_latency_seconds_sum 31.25",
+        "test_latency_seconds_count 4",
+    ], "Values past the last bucket only count towards +Inf"
+
+def test_render_metrics_includes_every_metric():
+    Counter("test_registered_total", "Registered")
+    text = render_metrics()
+    assert "# TYPE test_registered_total counter" in text
+    assert text.endswith("\n")
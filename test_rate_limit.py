@@ -0,0 +1,33 @@
+from app.utils.rate_limit import TokenBucket, RateLimiter
+from fake_clock import FakeClock
+
+def test_bucket_allows_burst_then_paces():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, capacity=2, clock=clock)
+    assert bucket.reserve() == 0, "First token is free"
+    assert bucket.reserve() == 0, "Burst up to capacity"
+    assert bucket.reserve() == 0.5, "Then one token every 1/rate seconds"
+    assert bucket.reserve() == 1.0, "Reservations queue up in order"
+
+def test_bucket_refills_over_time():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=1, capacity=1, clock=clock)
+    bucket.reserve()
+    clock.now += 1
+    assert bucket.reserve() == 0, "Token should be back after 1/rate seconds"
+
+def test_pause_honours_retry_after():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=1, capacity=1, clock=clock)
+    bucket.pause(5)
+    assert bucket.reserve() == 5, "Nothing goes out until retry_after has passed"
+    assert bucket.reserve() == 6, "Next token accrues only after the pause"
+
+def test_idle_chat_buckets_are_evicted():
+    clock = FakeClock()
+    limiter = RateLimiter(30, 30, 1, 1, max_keys=2, clock=clock)
+    for chat in ("a", "b"):
+        limiter.pause(chat, 0)
+    clock.now += 10
+    limiter.pause("c", 0)
+    assert len(limiter._buckets) <= 2, "Idle buckets should be dropped past max_keys"
@@ -1,5 +1,10 @@
-from datetime import datetime, timedelta
-from app.utils.time_utils import calculate_next_trigger, parse_time_unit
+from datetime import datetime, timedelta, timezone
+from app.utils.time_utils import (
+    calculate_next_trigger,
+    parse_time_unit,
+    next_occurrence,
+    catch_up_occurrences,
+)
 
 def test_one_time_reminder():
     # One-time reminder in 30 minutes
@@ -20,6 +25,39 @@ def test_parse_units():
     assert parse_time_unit("days") == (60 * 24, "days")
     assert parse_time_unit("invalid") == (None, None)
 
+def test_next_occurrence_is_anchored():
+    # Every 60 minutes from 09:00; processed late at 09:00:40
+    anchor = datetime(2025, 1, 1, 9, 0, tzinfo=timezone.utc)
+    now = anchor + timedelta(seconds=40)
+    next_time, missed = next_occurrence(anchor, 60, now)
+    assert next_time == anchor + timedelta(hours=1), "Should not drift with processing delay"
+    assert missed == 0
+
+def test_next_occurrence_after_downtime():
+    # Down for 5.5 hours with an hourly reminder
+    anchor = datetime(2025, 1, 1, 9, 0, tzinfo=timezone.utc)
+    now = anchor + timedelta(hours=5, minutes=30)
+    next_time, missed = next_occurrence(anchor, 60, now)
+    assert next_time == datetime(2025, 1, 1, 15, 0, tzinfo=timezone.utc)
+    assert missed == 5, "09:00 is due plus 10:00-14:00 were missed"
+
+def test_catch_up_policies():
+    anchor = datetime(2025, 1, 1, 9, 0, tzinfo=timezone.utc)
+    now = anchor + timedelta(hours=5, minutes=30)
+    next_time = datetime(2025, 1, 1, 15, 0, tzinfo=timezone.utc)
+
+    fire, nxt = catch_up_occurrences(anchor, 60, now, "fire_once", 10)
+    assert fire == [datetime(2025, 1, 1, 14, 0, tzinfo=timezone.utc)] and nxt == next_time
+
+    fire, nxt = catch_up_occurrences(anchor, 60, now, "fire_all", 3)
+    assert [f.hour for f in fire] == [12, 13, 14], "Capped to the most recent occurrences"
+
+    fire, nxt = catch_up_occurrences(anchor, 60, now, "skip", 10)
+    assert fire == [] and nxt == next_time, "Missed occurrences are dropped"
+
+    fire, _ = catch_up_occurrences(anchor, 60, anchor + timedelta(seconds=5), "skip", 10)
+    assert fire == [anchor], "A slightly late occurrence is not a missed one"
+
 if __name__ == "__main__":
     print("Running time utility tests...")
     
@@ -0,0 +1,22 @@
+from app.utils.ttl_cache import TTLCache
+from fake_clock import FakeClock
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = TTLCache(max_size=10, ttl_seconds=5, clock=clock)
+    cache.set("a", 1)
+    clock.now += 4
+    assert cache.get("a") == 1
+    clock.now += 1
+    assert cache.get("a") is None, "Entry should be gone once the TTL has passed"
+    assert "a" not in cache
+
+def test_least_recently_used_is_evicted():
+    cache = TTLCache(max_size=2, ttl_seconds=60, clock=FakeClock())
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert "b" not in cache, "b was used least recently"
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert len(cache) == 2